@@ -46,6 +46,9 @@ CACHE_DIR = f'{BASE_DIR}/.flask_cache'
 CACHE_THRESHOLD = 50000
 CACHE_TYPE = 'FileSystemCache'
 
+# Each worker listens for cache invalidations published by other workers and instances over Postgres LISTEN/NOTIFY.
+CACHE_NOTIFICATIONS_ENABLED = True
+
 CAS_SERVER = 'https://auth-test.berkeley.edu/cas/'
 
 CURRENT_TERM_ID = 'auto'
@@ -65,6 +68,9 @@ EMAIL_COURSE_EVALUATION_ADMIN_LABEL = 'Course Evaluation Admin'
 EMAIL_REDIRECT_WHEN_TESTING = ['__EMAIL_REDIRECT_WHEN_TESTING__at_berkeley.edu']
 EMAIL_TEST_MODE = True
 
+# Seconds a request waits for another to finish regenerating the same evaluations feed before regenerating it too.
+EVALUATION_FEED_LOCK_TIMEOUT = 10
+
 # Directory to search for mock fixtures, if running in "test" or "demo" mode.
 FIXTURES_PATH = None
 
@@ -73,6 +79,20 @@ INACTIVE_SESSION_LIFETIME = 240
 
 INDEX_HTML = 'dist/static/index.html'
 
+# Storage format of cached section feeds: 'jsonb', or 'gzip' to store compressed bytes that can be served to clients as-is.
+JSON_CACHE_FORMAT = 'jsonb'
+
+# Size of the per-worker memory cache in front of json_cache; 0 disables it. Used only while CACHE_NOTIFICATIONS_ENABLED.
+JSON_CACHE_LOCAL_MB = 64
+
+# Worker threads used to warm up department feed caches after a loch refresh; capped by the DB connection pool size.
+LOCH_REFRESH_WARM_UP_WORKERS = 4
+
+# Upstream SIS data for the loch refresh is read from Nessie by 'dblink', or from local CSV files by 'snapshot'. Snapshot
+# files are read from LOCH_SNAPSHOT_PATH/<term_id>/<table>.csv, plus LOCH_SNAPSHOT_PATH/basic_attributes.csv.
+LOCH_SNAPSHOT_PATH = None
+LOCH_SOURCE = 'dblink'
+
 # Logging
 LOGGING_FORMAT = '[%(asctime)s] - %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
 LOGGING_LOCATION = 'damien.log'
@@ -89,6 +109,12 @@ SFTP_HOST = 'hostname'
 SFTP_PORT = 22
 SFTP_USER = 'username'
 
+# Worker threads that rebuild stale department summaries in the background, while the stale summaries are served.
+SUMMARY_REBUILD_WORKERS = 2
+
+# Stream large department evaluation feeds to the client section by section, rather than serializing them in one piece.
+STREAM_EVALUATION_FEEDS = True
+
 # Save DB changes at the end of a request.
 SQLALCHEMY_COMMIT_ON_TEARDOWN = True
 
@@ -25,12 +25,10 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 from damien.api.errors import BadRequestError
 from damien.api.util import admin_required
-from damien.lib.berkeley import available_term_ids, get_current_term_id, term_name_for_sis_id
+from damien.lib.berkeley import available_term_ids, get_current_term_id, get_meeting_dates, term_name_for_sis_id
 from damien.lib.http import tolerant_jsonify
-from damien.lib.queries import get_default_meeting_dates, get_valid_meeting_dates
+from damien.lib.reference_data import get_department_forms, get_evaluation_types
 from damien.lib.util import safe_strftime, to_bool_or_none
-from damien.models.department_form import DepartmentForm
-from damien.models.evaluation_type import EvaluationType
 from damien.models.tool_setting import ToolSetting
 from flask import current_app as app, request
 from flask_login import current_user, login_required
@@ -38,8 +36,8 @@ from flask_login import current_user, login_required
 
 @app.route('/api/config')
 def app_config():
-    def _term_feed(term_id, default_meeting_dates, valid_meeting_dates):
-        if not (default_meeting_dates and valid_meeting_dates):
+    def _term_feed(term_id, meeting_dates):
+        if not meeting_dates:
             app.logger.warn(f'No meeting dates found for term_id {term_id}')
             return {
                 'id': term_id,
@@ -49,31 +47,26 @@ def app_config():
             'id': term_id,
             'name': term_name_for_sis_id(term_id),
             'defaultDates': {
-                'begin': safe_strftime(default_meeting_dates['start_date'], '%Y-%m-%d'),
-                'end': safe_strftime(default_meeting_dates['end_date'], '%Y-%m-%d'),
+                'begin': safe_strftime(meeting_dates['default']['start_date'], '%Y-%m-%d'),
+                'end': safe_strftime(meeting_dates['default']['end_date'], '%Y-%m-%d'),
             },
             'validDates': {
-                'begin': safe_strftime(valid_meeting_dates['start_date'], '%Y-%m-%d'),
-                'end': safe_strftime(valid_meeting_dates['end_date'], '%Y-%m-%d'),
+                'begin': safe_strftime(meeting_dates['valid']['start_date'], '%Y-%m-%d'),
+                'end': safe_strftime(meeting_dates['valid']['end_date'], '%Y-%m-%d'),
             },
         }
 
     term_ids = available_term_ids()
     current_term_id = get_current_term_id()
-    default_meeting_dates = {row['term_id']: row for row in get_default_meeting_dates(term_ids)}
-    valid_meeting_dates = {row['term_id']: row for row in get_valid_meeting_dates(term_ids)}
+    meeting_dates = get_meeting_dates(term_ids)
 
-    department_forms = DepartmentForm.query.order_by(DepartmentForm.name).all()
-    evaluation_types = EvaluationType.query.filter_by(deleted_at=None).order_by(EvaluationType.name).all()
+    department_forms = get_department_forms(include_deleted=True)
+    evaluation_types = get_evaluation_types()
     # Force 'F' and 'G' to sort to the top of the list.
     evaluation_types = sorted(evaluation_types, key=lambda e: {'F': '0', 'G': '00'}.get(e.name, e.name))
 
     return tolerant_jsonify({
-        'availableTerms': [_term_feed(
-            term_id,
-            default_meeting_dates.get(term_id),
-            valid_meeting_dates.get(term_id),
-        ) for term_id in term_ids],
+        'availableTerms': [_term_feed(term_id, meeting_dates.get(term_id)) for term_id in term_ids],
         'currentTermId': current_term_id,
         'currentTermName': term_name_for_sis_id(current_term_id),
         'damienEnv': app.config['DAMIEN_ENV'],
@@ -29,9 +29,8 @@ import re
 from damien.api.errors import BadRequestError, ResourceNotFoundError
 from damien.api.util import admin_required, department_membership_required, get_boolean_param, get_term_id
 from damien.lib import cache
-from damien.lib.berkeley import term_name_for_sis_id
-from damien.lib.http import tolerant_jsonify
-from damien.lib.queries import get_valid_meeting_dates
+from damien.lib.berkeley import get_meeting_dates, term_name_for_sis_id
+from damien.lib.http import gzipped_json_response, tolerant_jsonify, tolerant_jsonify_stream
 from damien.lib.util import get as get_param, safe_strftime
 from damien.models.department import Department
 from damien.models.department_form import DepartmentForm
@@ -87,12 +86,15 @@ def get_department(department_id):
     if not department:
         raise ResourceNotFoundError(f'Department {department_id} not found.')
     term_id = get_term_id(request)
+    stream_evaluations = app.config['STREAM_EVALUATION_FEEDS']
     feed = department.to_api_json(
         term_id=term_id,
         include_contacts=True,
-        include_evaluations=True,
+        include_evaluations=not stream_evaluations,
     )
     feed['evaluationTerm'] = EvaluationTerm.find_or_create(term_id).to_api_json()
+    if stream_evaluations:
+        return tolerant_jsonify_stream(department.evaluations_feed_by_section(term_id), wrapper=feed, key='evaluations')
     return tolerant_jsonify(feed)
 
 
@@ -105,6 +107,11 @@ def get_section_evaluations(department_id, section_id):
     term_id = get_term_id(request)
     if not section_id or not re.match(r'\d{5}\Z', section_id):
         raise BadRequestError('Missing or invalid course number.')
+    # A single-section feed is exactly what the section cache holds, so compressed bytes can be sent as stored.
+    if 'gzip' in request.accept_encodings:
+        payload = cache.fetch_section_payload(department.id, term_id, section_id)
+        if payload:
+            return gzipped_json_response(payload)
     feed = department.evaluations_feed(term_id, section_id=section_id)
     return tolerant_jsonify(feed)
 
@@ -267,7 +274,7 @@ def _validate_evaluation_fields(fields, term_id, dept_uses_midterm_forms):  # no
 
 
 def _validate_current_term_date(submitted_date, term_id):
-    valid_meeting_dates = get_valid_meeting_dates(term_ids=[term_id])[0]
+    valid_meeting_dates = get_meeting_dates([term_id])[term_id]['valid']
     if submitted_date < valid_meeting_dates['start_date'] or submitted_date > valid_meeting_dates['end_date']:
         submitted_date = safe_strftime(submitted_date, '%m/%d/%Y')
         raise BadRequestError(f'Date {submitted_date} is outside the {term_name_for_sis_id(term_id)} term.')
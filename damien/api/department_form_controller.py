@@ -24,7 +24,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from damien.api.util import admin_required
-from damien.lib.cache import delete_from_cache
+from damien.lib import reference_data
 from damien.lib.http import tolerant_jsonify
 from damien.models.department_form import DepartmentForm
 from flask import current_app as app
@@ -42,12 +42,11 @@ def add_department_form(name):
 @admin_required
 def delete_department_form(name):
     DepartmentForm.delete(name)
-    delete_from_cache(name)
     return tolerant_jsonify({'message': f'Department form {name} has been deleted'}), 200
 
 
 @app.route('/api/department_forms')
 @login_required
 def get_department_forms():
-    department_forms = DepartmentForm.query.filter_by(deleted_at=None).order_by(DepartmentForm.name).all()
+    department_forms = reference_data.get_department_forms()
     return tolerant_jsonify([d.to_api_json() for d in department_forms])
@@ -24,7 +24,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from datetime import datetime
-from itertools import groupby
+from itertools import chain, groupby
 import os
 from threading import Thread
 from urllib.parse import unquote
@@ -33,7 +33,7 @@ from damien.api.errors import BadRequestError, InternalServerError
 from damien.api.util import admin_required, get_term_id
 from damien.externals.s3 import get_s3_path, stream_folder_zipped
 from damien.lib.exporter import background_generate_exports, generate_exports
-from damien.lib.http import tolerant_jsonify
+from damien.lib.http import tolerant_jsonify, tolerant_jsonify_stream
 from damien.models.department import Department
 from damien.models.evaluation import Evaluation
 from damien.models.export import Export
@@ -106,9 +106,17 @@ def get_term_evaluation_exports():
 def get_validation():
     term_id = get_term_id(request)
     evals = Evaluation.get_invalid(term_id)
+
+    # Department feeds are regenerated as needed before any of the response is sent.
+    feeds_by_section = chain.from_iterable([
+        Department.find_by_id(dept_id).evaluations_feed_by_section(term_id, evaluation_ids=[e.id for e in dept_evals])
+        for dept_id, dept_evals in groupby(evals, key=lambda e: e.department_id)
+    ])
+    if app.config['STREAM_EVALUATION_FEEDS']:
+        return tolerant_jsonify_stream(feeds_by_section)
     feed = []
-    for dept_id, dept_evals in groupby(evals, key=lambda e: e.department_id):
-        feed.extend(Department.find_by_id(dept_id).evaluations_feed(term_id, evaluation_ids=[e.id for e in dept_evals]))
+    for section_feed in feeds_by_section:
+        feed.extend(section_feed)
     return tolerant_jsonify(feed)
 
 
@@ -24,6 +24,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from damien.api.util import admin_required
+from damien.lib import reference_data
 from damien.lib.http import tolerant_jsonify
 from damien.models.evaluation_type import EvaluationType
 from flask import current_app as app
@@ -47,6 +48,6 @@ def delete_evaluation_type(name):
 @app.route('/api/evaluation_types')
 @login_required
 def get_evaluation_types():
-    evaluation_types = EvaluationType.query.filter_by(deleted_at=None).order_by(EvaluationType.name).all()
+    evaluation_types = reference_data.get_evaluation_types()
     # Force 'F' and 'G' to sort to the top of the list.
     return tolerant_jsonify([e.to_api_json() for e in sorted(evaluation_types, key=lambda e: {'F': '0', 'G': '00'}.get(e.name, e.name))])
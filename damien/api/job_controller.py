@@ -25,9 +25,11 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 from damien.api.errors import InternalServerError
 from damien.api.util import admin_required
-from damien.jobs.refresh_unholy_loch import is_refreshing, refresh_from_api
+from damien.jobs.refresh_unholy_loch import is_refreshing, JOB_KEY, refresh_from_api
 from damien.lib.http import tolerant_jsonify
-from flask import current_app as app
+from damien.lib.util import to_int
+from damien.models.job_run import JobRun
+from flask import current_app as app, request
 
 
 @app.route('/api/job/refresh_unholy_loch')
@@ -43,4 +45,15 @@ def refresh_unholy_loch():
 @admin_required
 def status():
     status = 'executing' if is_refreshing() else 'done'
-    return tolerant_jsonify({'status': status})
+    latest_run = JobRun.get_latest(JOB_KEY)
+    return tolerant_jsonify({
+        'status': status,
+        'run': latest_run and latest_run.to_api_json(),
+    })
+
+
+@app.route('/api/job/history')
+@admin_required
+def history():
+    limit = min(max(to_int(request.args.get('limit')) or 20, 1), 100)
+    return tolerant_jsonify([run.to_api_json() for run in JobRun.get_history(JOB_KEY, limit=limit)])
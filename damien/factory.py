@@ -26,7 +26,10 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from damien import cache, db
 from damien.configs import load_configs
 from damien.jobs.refresh_unholy_loch import initialize_refresh_schedule
+from damien.lib.cache import flush_invalidations_on_teardown
+from damien.lib.notifications import initialize_listener
 from damien.logger import initialize_logger
+from damien.models.evaluation import flush_validity_updates_on_teardown
 from damien.routes import register_routes
 from flask import Flask
 
@@ -39,9 +42,14 @@ def create_app():
     cache.init_app(app)
     cache.clear()
     db.init_app(app)
+    # Registered after the database so that pending cache invalidations are flushed before the session is removed. Teardowns run
+    # in reverse, so buffered validity updates are written first, along with the invalidations they add.
+    app.teardown_appcontext(flush_invalidations_on_teardown)
+    app.teardown_appcontext(flush_validity_updates_on_teardown)
 
     with app.app_context():
         register_routes(app)
         initialize_refresh_schedule(app)
+        initialize_listener(app)
 
     return app
@@ -0,0 +1,75 @@
+"""
+Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+from threading import Lock
+
+from damien.models.department import Department
+from flask import current_app as app
+
+
+_executor = None
+_lock = Lock()
+_queued = set()
+
+
+def queue_summary_rebuild(department_id, term_id):
+    """Rebuild a stale department summary in the background, unless a rebuild for it is already queued in this worker."""
+    key = (department_id, term_id)
+    with _lock:
+        if key in _queued:
+            return
+        _queued.add(key)
+    if os.environ.get('DAMIEN_ENV') in ['test', 'testext']:
+        # Tests share a single database session, so the rebuild runs in place rather than on a thread with its own session.
+        try:
+            Department.rebuild_summary_feed(department_id, term_id)
+        finally:
+            with _lock:
+                _queued.discard(key)
+    else:
+        app_arg = app._get_current_object()
+        _get_executor(app_arg).submit(_rebuild_summary, app_arg, department_id, term_id)
+
+
+def _get_executor(app_arg):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app_arg.config['SUMMARY_REBUILD_WORKERS'], thread_name_prefix='rebuild_summary')
+        return _executor
+
+
+def _rebuild_summary(app_arg, department_id, term_id):
+    with app_arg.app_context():
+        try:
+            Department.rebuild_summary_feed(department_id, term_id)
+        except Exception as e:
+            app_arg.logger.error(f'Summary rebuild failed (dept_id={department_id}, term_id={term_id})')
+            app_arg.logger.exception(e)
+        finally:
+            with _lock:
+                _queued.discard((department_id, term_id))
@@ -23,26 +23,43 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import re
 from threading import Thread
+import time
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from damien import cache, db, std_commit
 from damien.externals.s3 import get_s3_path
-from damien.lib.berkeley import get_current_term_id, get_refreshable_term_ids
+from damien.lib import notifications
+from damien.lib.berkeley import clear_meeting_dates, get_current_term_id, get_meeting_dates, get_refreshable_term_ids
+from damien.lib.cache import clear_department_cache, clear_dependent_caches, clear_section_cache, clear_term_cache, sweep_stale_caches
 from damien.lib.exporter import generate_exports
-from damien.lib.queries import refresh_additional_instructors
+from damien.lib.loch_source import load_basic_attributes_snapshot, load_loch_sources
+from damien.lib.queries import consume_section_changes, get_section_changes, get_section_department_ids, refresh_additional_instructors
 from damien.lib.util import resolve_sql_template
 from damien.models.department import Department
 from damien.models.export import Export
+from damien.models.job_run import JobRun
 from damien.models.tool_setting import ToolSetting
 from damien.models.util import advisory_lock, get_granted_lock_ids
 from sqlalchemy.sql import text
 
 
+JOB_KEY = 'refresh_unholy_loch'
 LOCH_REFRESH_LOCK_ID = 666
 
+# Row counts reported for template phases are read from the shadow tables each phase loads.
+PHASE_TABLES = {
+    'sections': 'sis_sections_shadow',
+    'instructors': 'sis_instructors_shadow',
+    'enrollments': 'sis_enrollments_shadow',
+    'cross-listings': 'cross_listings_shadow',
+}
+
 
 def initialize_refresh_schedule(app):
     if app.config['SCHEDULE_LOCH_REFRESH']:
@@ -90,19 +107,23 @@ def _bg_refresh_unholy_loch(app, publish_before_refresh=False):
             if not has_lock:
                 return
 
+            run_id = JobRun.start(JOB_KEY)
+
             if publish_before_refresh and ToolSetting.get_tool_setting_boolean('AUTO_PUBLISH_ENABLED'):
                 app.logger.info('Starting automatic publication...')
 
                 term_id = get_current_term_id()
                 timestamp = datetime.now()
 
-                try:
-                    generate_exports(term_id, timestamp)
-                    app.logger.info('Automatic publication complete.')
-                except Exception as e:
-                    app.logger.error('Automatic publication failed.')
-                    app.logger.exception(e)
-                    Export.update_status(get_s3_path(term_id, timestamp), 'error')
+                with _phase(run_id, 'publish', term_id) as progress:
+                    try:
+                        generate_exports(term_id, timestamp)
+                        app.logger.info('Automatic publication complete.')
+                    except Exception as e:
+                        app.logger.error('Automatic publication failed.')
+                        app.logger.exception(e)
+                        Export.update_status(get_s3_path(term_id, timestamp), 'error')
+                        progress['error'] = str(e)
 
             app.logger.info('Starting unholy loch refresh...')
 
@@ -110,22 +131,137 @@ def _bg_refresh_unholy_loch(app, publish_before_refresh=False):
                 template_sql = 'refresh_unholy_loch.template.sql'
                 cache.delete('current_term_id')
                 term_ids = get_refreshable_term_ids()
+                if app.config['LOCH_SOURCE'] == 'snapshot':
+                    # Loaded once for all terms, and kept for lookups of instructors added before the next refresh.
+                    with _phase(run_id, 'basic-attributes') as progress:
+                        progress['rows'] = load_basic_attributes_snapshot()
                 for term_id in term_ids:
+                    meeting_dates = get_meeting_dates([term_id]).get(term_id)
+                    with _phase(run_id, 'source', term_id) as progress:
+                        progress['rows'] = sum(load_loch_sources(term_id).values())
                     resolved_ddl = resolve_sql_template(template_sql, term_id=term_id)
-                    db.session().execute(text(resolved_ddl))
-                    refresh_additional_instructors()
+                    for phase, phase_sql in _template_phases(resolved_ddl):
+                        with _phase(run_id, phase, term_id) as progress:
+                            db.session().execute(text(phase_sql))
+                            if phase in PHASE_TABLES:
+                                progress['rows'] = db.session().execute(text(f'SELECT COUNT(*) FROM unholy_loch.{PHASE_TABLES[phase]}')).scalar()
+                    # Commit at once to release locks taken by the shadow table swap. The swap replaces sis_instructors, so the
+                    # instructor directory held by workers is reloaded.
+                    ToolSetting.bump_version('INSTRUCTOR_DIRECTORY_VERSION')
                     std_commit()
 
+                    with _phase(run_id, 'invalidation', term_id) as progress:
+                        refresh_additional_instructors()
+                        changes = get_section_changes(term_id)
+                        course_numbers = {c.course_number for c in changes if c.course_number}
+                        # Departments are collected before and after section membership is rebuilt, so that sections moving
+                        # between departments invalidate both.
+                        department_ids = set(get_section_department_ids(term_id, course_numbers))
+                        std_commit()
+                        clear_meeting_dates(term_id)
+                        Department.refresh_all_sections(term_id)
+                        department_ids.update(get_section_department_ids(term_id, course_numbers))
+                        _invalidate_caches(app, term_id, changes, course_numbers, department_ids, meeting_dates)
+                        # Changes are consumed in the same commit that bumps cache epochs, so that a failed invalidation
+                        # leaves them for the next refresh.
+                        consume_section_changes(term_id)
+                        std_commit()
+                        progress['rows'] = len(course_numbers)
+
                     # Pre-populate term cache by generating full evaluation feeds for all departments.
-                    department_ids = [d.id for d in Department.all_enrolled()]
-                    for dept_id in department_ids:
-                        d = Department.find_by_id(dept_id)
-                        d.evaluations_feed(term_id=term_id)
+                    with _phase(run_id, 'warm-up', term_id) as progress:
+                        timings = _warm_up_cache(app, term_id, on_progress=lambda count: JobRun.update_phase(run_id, rows=count))
+                        progress['rows'] = len(timings)
 
                     app.logger.info(f'Term {term_id} refreshed.')
 
+                # Once feeds are warmed up, cache rows left behind by epoch invalidation can be reclaimed.
+                sweep_stale_caches()
+                # Other workers and instances drop their cached term data once the refresh is committed.
+                for term_id in term_ids:
+                    notifications.publish('loch_refresh', term_id)
+                std_commit()
+                JobRun.finish(run_id)
+
                 app.logger.info(f"Unholy loch refresh completed (term_ids={','.join(term_ids)}), cache refreshed.")
 
             except Exception as e:
                 app.logger.error('Unholy loch refresh failed:')
                 app.logger.exception(e)
+                JobRun.finish(run_id, error=str(e))
+
+
+@contextmanager
+def _phase(run_id, phase, term_id=None):
+    JobRun.start_phase(run_id, phase, term_id)
+    started_at = time.monotonic()
+    progress = {'rows': None, 'error': None}
+    try:
+        yield progress
+    except Exception as e:
+        JobRun.update_phase(run_id, rows=progress['rows'], seconds=time.monotonic() - started_at, error=str(e))
+        raise
+    JobRun.update_phase(run_id, rows=progress['rows'], seconds=time.monotonic() - started_at, error=progress['error'])
+
+
+def _template_phases(resolved_ddl):
+    # The template is split on its '-- Phase: <name>' markers; anything before the first marker is only commentary.
+    parts = re.split(r'^-- Phase: ([\w-]+)$', resolved_ddl, flags=re.MULTILINE)
+    return list(zip(parts[1::2], parts[2::2]))
+
+
+def _invalidate_caches(app, term_id, changes, course_numbers, department_ids, meeting_dates):
+    # Default meeting dates are computed across the term and appear in every feed.
+    if meeting_dates != get_meeting_dates([term_id]).get(term_id):
+        app.logger.info(f'Meeting dates changed; clearing cache for term {term_id}')
+        clear_term_cache(term_id)
+        return
+    instructor_uids = {c.instructor_uid for c in changes if c.change == 'instructor'}
+    app.logger.info(
+        f'Clearing cache for {len(course_numbers)} changed sections, {len(department_ids)} departments and '
+        f'{len(instructor_uids)} instructors (term_id={term_id})')
+    for course_number in course_numbers:
+        clear_section_cache(term_id, course_number)
+    for department_id in department_ids:
+        clear_department_cache(department_id, term_id)
+    for uid in instructor_uids:
+        clear_dependent_caches('instructor', uid)
+
+
+def _warm_up_cache(app, term_id, on_progress=None):
+    department_ids = [d.id for d in Department.all_enrolled()]
+    # Each worker holds two pooled connections while generating a feed, its session's and the one holding the regeneration
+    # lock, so stay within pool size and leave overflow to web requests.
+    pool_size = db.engine.pool.size() if hasattr(db.engine.pool, 'size') else 2
+    max_workers = max(1, min(app.config['LOCH_REFRESH_WARM_UP_WORKERS'], pool_size // 2))
+    app.logger.info(f'Warming up cache for {len(department_ids)} departments (term_id={term_id}, workers={max_workers})')
+
+    timings = {}
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='warm_up_cache') as executor:
+        futures = {executor.submit(_warm_up_department, app, dept_id, term_id): dept_id for dept_id in department_ids}
+        for future in as_completed(futures):
+            dept_id = futures[future]
+            try:
+                timings[dept_id] = future.result()
+            except Exception as e:
+                app.logger.error(f'Cache warm-up failed (dept_id={dept_id}, term_id={term_id})')
+                app.logger.exception(e)
+            if on_progress:
+                on_progress(len(timings))
+
+    slowest = sorted(timings.items(), key=lambda t: t[1], reverse=True)[:5]
+    app.logger.info(
+        f'Cache warm-up for term {term_id} took {time.monotonic() - started_at:.2f}s; '
+        f"{len(timings)} of {len(department_ids)} departments warmed, slowest: {', '.join(f'{d} ({t:.2f}s)' for d, t in slowest)}")
+    return timings
+
+
+def _warm_up_department(app, dept_id, term_id):
+    # A fresh app context per department gives each worker thread its own DB session, removed when the context is torn down.
+    with app.app_context():
+        started_at = time.monotonic()
+        Department.find_by_id(dept_id).evaluations_feed(term_id=term_id)
+        elapsed = time.monotonic() - started_at
+        app.logger.info(f'Cache warmed for dept_id={dept_id}, term_id={term_id} in {elapsed:.2f}s')
+        return elapsed
@@ -26,6 +26,8 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from datetime import date, timedelta
 
 from damien import cache
+from damien.lib import notifications
+from damien.lib.queries import get_default_meeting_dates, get_valid_meeting_dates
 from damien.models.util import select_column
 from flask import current_app as app
 
@@ -51,6 +53,44 @@ def get_current_term_id():
         return app.config['CURRENT_TERM_ID']
 
 
+def get_meeting_dates(term_ids):
+    """Return default and valid meeting dates per term. Values are memoized per term and cleared on loch refresh."""
+    meeting_dates = {}
+    uncached_term_ids = []
+    for term_id in term_ids:
+        cached = cache.get(_meeting_dates_cache_key(term_id))
+        if cached:
+            meeting_dates[term_id] = cached
+        else:
+            uncached_term_ids.append(term_id)
+    if uncached_term_ids:
+        default_meeting_dates = {row['term_id']: row for row in get_default_meeting_dates(uncached_term_ids)}
+        valid_meeting_dates = {row['term_id']: row for row in get_valid_meeting_dates(uncached_term_ids)}
+        for term_id in uncached_term_ids:
+            default_row = default_meeting_dates.get(term_id)
+            valid_row = valid_meeting_dates.get(term_id)
+            if not (default_row and valid_row):
+                continue
+            meeting_dates[term_id] = {
+                'default': {'start_date': default_row['start_date'], 'end_date': default_row['end_date']},
+                'valid': {'start_date': valid_row['start_date'], 'end_date': valid_row['end_date']},
+            }
+            cache.set(_meeting_dates_cache_key(term_id), meeting_dates[term_id])
+    return meeting_dates
+
+
+def clear_meeting_dates(term_id):
+    cache.delete(_meeting_dates_cache_key(term_id))
+
+
+def clear_term_caches(term_id=None):
+    # Run on loch refresh notifications, since the file cache is local to each instance. Without a term id, any refresh may
+    # have been missed and only the current term id can be cleared.
+    cache.delete('current_term_id')
+    if term_id:
+        clear_meeting_dates(term_id)
+
+
 def get_refreshable_term_ids():
     current_term_id = get_current_term_id()
     term_in_progress_result = select_column(f"""
@@ -97,3 +137,10 @@ def term_name_for_sis_id(sis_id=None):
         }
         year = f'19{sis_id[1:3]}' if sis_id.startswith('1') else f'20{sis_id[1:3]}'
         return f'{season_codes[sis_id[3:4]]} {year}'
+
+
+def _meeting_dates_cache_key(term_id):
+    return f'meeting_dates_{term_id}'
+
+
+notifications.subscribe('loch_refresh', clear_term_caches)
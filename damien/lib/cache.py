@@ -23,55 +23,195 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from damien import db, std_commit
+from damien.lib.lru_cache import SizedLRUCache
 from damien.models.json_cache import JsonCache
-from flask import current_app as app
+from flask import current_app as app, g, has_app_context
+import simplejson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Cache invalidations are collected per request as (term_id, department_id, course_number) keys. A department_id of None
+# clears the course from every department; a course_number of None clears the department summary. Pending keys bump their
+# cache epochs in one statement before any cache read or write, before the session commits, and when the app context ends.
+
+_local_cache = None
 
 
 def clear_department_cache(department_id, term_id):
     app.logger.debug(f'Clearing department cache (department_id={department_id}, term_id={term_id})')
-    JsonCache.clear_department(term_id, department_id)
+    _invalidate(term_id, department_id, None)
 
 
 def clear_department_section_cache(department_id, term_id, course_number):
     app.logger.debug(f'Clearing department section cache (department_id={department_id}, term_id={term_id}, course_number={course_number})')
-    JsonCache.clear_department_section(term_id, department_id, course_number)
+    _invalidate(term_id, department_id, course_number)
 
 
 def clear_section_cache(term_id, course_number):
     app.logger.debug(f'Clearing section cache (term_id={term_id}, course_number={course_number})')
-    JsonCache.clear_section(term_id, course_number)
+    _invalidate(term_id, None, course_number)
+
+
+def clear_term_cache(term_id):
+    app.logger.debug(f'Clearing term cache (term_id={term_id})')
+    _invalidate(term_id, None, None)
 
 
-def delete_from_cache(token):
-    app.logger.debug(f'Deleting from cache (json LIKE {token})')
-    JsonCache.delete_matching(token)
+def clear_dependent_caches(kind, value):
+    # Sections whose feeds depend on the value are cleared along with the summaries of their departments, which are served
+    # stale until rebuilt.
+    keys = JsonCache.fetch_dependent_keys(kind, value)
+    app.logger.debug(f'Clearing {len(keys)} section caches depending on {kind} {value}')
+    for term_id, department_id, course_number in keys:
+        _invalidate(term_id, department_id, course_number)
+        _invalidate(term_id, department_id, None)
 
 
 def fetch_all_departments(term_id):
+    flush_invalidations()
     app.logger.debug(f'Fetching departments (term_id={term_id})')
-    return {d.department_id: d.json for d in JsonCache.fetch_all_departments(term_id)}
+    rows = _fetch_locally(
+        ('departments', term_id),
+        lambda: [[d.department_id, d.json, d.is_current] for d in JsonCache.fetch_all_departments(term_id)],
+    )
+    return {department_id: _summary(summary, is_current) for department_id, summary, is_current in rows}
 
 
 def fetch_all_sections(department_id, term_id):
+    flush_invalidations()
     app.logger.debug(f'Fetching department sections (department_id={department_id}, term_id={term_id})')
-    return {s.course_number: s.json for s in JsonCache.fetch_all_sections(term_id, department_id)}
+    return _fetch_locally(
+        ('sections', term_id, department_id),
+        lambda: {s.course_number: s.to_api_json() for s in JsonCache.fetch_all_sections(term_id, department_id)},
+    )
+
+
+def fetch_cached_course_numbers(department_id, term_id):
+    flush_invalidations()
+    app.logger.debug(f'Fetching cached course numbers (department_id={department_id}, term_id={term_id})')
+    return _fetch_locally(('course_numbers', term_id, department_id), lambda: JsonCache.fetch_section_course_numbers(term_id, department_id))
 
 
 def fetch_department_cache(department_id, term_id):
+    flush_invalidations()
     app.logger.debug(f'Fetching department cache (department_id={department_id}, term_id={term_id})')
-    return JsonCache.fetch_department(term_id, department_id)
+    return _fetch_locally(('department', term_id, department_id), lambda: JsonCache.fetch_department(term_id, department_id))
+
+
+def fetch_department_summary(department_id, term_id):
+    flush_invalidations()
+    app.logger.debug(f'Fetching department summary (department_id={department_id}, term_id={term_id})')
+
+    def _load():
+        row = JsonCache.fetch_department_summary(term_id, department_id)
+        return row and [row.json, row.is_current]
+    row = _fetch_locally(('department_summary', term_id, department_id), _load)
+    return row and _summary(*row)
 
 
 def fetch_section_cache(department_id, term_id, course_number):
+    flush_invalidations()
     app.logger.debug(f'Fetching section cache (department_id={department_id}, term_id={term_id}, course_number={course_number})')
     return JsonCache.fetch_section(term_id, department_id, course_number)
 
 
+def fetch_section_payload(department_id, term_id, course_number):
+    flush_invalidations()
+    app.logger.debug(f'Fetching section payload (department_id={department_id}, term_id={term_id}, course_number={course_number})')
+    return JsonCache.fetch_section_payload(term_id, department_id, course_number)
+
+
+def fetch_sections_cache(department_id, term_id, course_numbers):
+    flush_invalidations()
+    app.logger.debug(f'Fetching {len(course_numbers)} section caches (department_id={department_id}, term_id={term_id})')
+    return _fetch_locally(
+        ('section_batch', term_id, department_id, *course_numbers),
+        lambda: {s.course_number: s.to_api_json() for s in JsonCache.fetch_sections(term_id, department_id, course_numbers)},
+    )
+
+
 def set_department_cache(department_id, term_id, cached):
+    flush_invalidations()
     app.logger.debug(f'Setting department cache (department_id={department_id}, term_id={term_id})')
     JsonCache.set_department(term_id, department_id, cached)
 
 
+def set_sections_cache(department_id, term_id, sections, commit=True):
+    flush_invalidations()
+    app.logger.debug(f'Setting {len(sections)} section caches (department_id={department_id}, term_id={term_id})')
+    if sections:
+        JsonCache.set_sections(term_id, department_id, sections, commit=commit)
+
+
 def set_section_cache(department_id, term_id, course_number, cached):
+    flush_invalidations()
     app.logger.debug(f'Setting section cache (department_id={department_id}, term_id={term_id}, course_number={course_number})')
     JsonCache.set_section(term_id, department_id, course_number, cached)
+
+
+def flush_invalidations():
+    keys = _pending_invalidations(pop=True)
+    if keys:
+        app.logger.debug(f'Flushing {len(keys)} cache invalidations')
+        JsonCache.bump_epochs(keys)
+
+
+def sweep_stale_caches():
+    flush_invalidations()
+    app.logger.debug('Sweeping stale caches')
+    return JsonCache.sweep_stale()
+
+
+def flush_invalidations_on_teardown(exception=None):
+    if exception:
+        _pending_invalidations(pop=True)
+    elif _pending_invalidations():
+        flush_invalidations()
+        std_commit()
+
+
+@event.listens_for(Session, 'before_commit')
+def _flush_invalidations_before_commit(session):
+    if has_app_context() and session is db.session() and _pending_invalidations():
+        flush_invalidations()
+
+
+def _fetch_locally(scope, load):
+    # Feeds read from json_cache are kept in worker memory, encoded so that callers never share mutable objects, and keyed by
+    # the generation of the term and department they belong to. Notifications of a write or invalidation advance only the
+    # generations covering it, after which older entries are never read. Without a generation, reads bypass worker memory.
+    global _local_cache
+    max_size = app.config['JSON_CACHE_LOCAL_MB'] * 1024 * 1024
+    if not max_size:
+        return load()
+    if _local_cache is None or _local_cache.max_size != max_size:
+        _local_cache = SizedLRUCache(max_size)
+    kind, term_id, *rest = scope
+    generation = JsonCache.get_generation(term_id, None if kind == 'departments' else rest[0])
+    if generation is None:
+        return load()
+    key = (*scope, generation)
+    encoded = _local_cache.get(key)
+    if encoded is not None:
+        return simplejson.loads(encoded)
+    value = load()
+    _local_cache.set(key, simplejson.dumps(value, ignore_nan=True, separators=(',', ':')))
+    return value
+
+
+def _summary(summary, is_current):
+    # A stale department summary is served flagged as refreshing, while a rebuild is queued.
+    return summary if is_current else {**summary, 'refreshing': True}
+
+
+def _invalidate(term_id, department_id, course_number):
+    if 'json_cache_invalidations' not in g:
+        g.json_cache_invalidations = set()
+    g.json_cache_invalidations.add((term_id, department_id, course_number))
+
+
+def _pending_invalidations(pop=False):
+    if pop:
+        return g.pop('json_cache_invalidations', None)
+    return g.get('json_cache_invalidations')
@@ -32,9 +32,9 @@ from damien.externals.s3 import get_s3_path, put_binary_data_to_s3, stream_objec
 from damien.externals.sftp import get_sftp_client
 from damien.lib.berkeley import term_code_for_sis_id, term_ids_range
 from damien.lib.queries import get_confirmed_enrollments, get_loch_basic_attributes
+from damien.lib.reference_data import get_catalog_listing_matcher
 from damien.lib.util import safe_strftime
 from damien.models.department import Department
-from damien.models.department_catalog_listing import DepartmentCatalogListing
 from damien.models.department_form import DepartmentForm
 from damien.models.evaluation import Evaluation, is_modular
 from damien.models.export import Export
@@ -56,7 +56,7 @@ def background_generate_exports(app_arg, term_id, timestamp):
 def generate_exports(term_id, timestamp):
     s3_path = get_s3_path(term_id, timestamp)
     export = Export.create(term_id, s3_path)
-    all_catalog_listings = DepartmentCatalogListing.query.all()
+    catalog_listing_matcher = get_catalog_listing_matcher()
     dept_forms_to_uids = {df.name: [u.uid for u in df.users if not u.deleted_at] for df in DepartmentForm.query.all()}
 
     # We fetch past-term exports for 1) course-instructor mappings; 2) course-supervisor mappings for cross-listed courses; 3) instructor data.
@@ -67,9 +67,9 @@ def generate_exports(term_id, timestamp):
         if last_export:
             past_term_export_path = last_export.s3_path
 
-    evaluation_keys_to_instructor_uids, current_term_instructors, sections = _generate_evaluation_maps(term_id)
+    evaluation_keys_to_instructor_uids, current_term_instructors, sections = _generate_evaluation_maps(term_id, catalog_listing_matcher)
     courses, current_term_course_instructors, course_students, course_supervisors, students, current_term_xlisted_course_supervisors =\
-        _generate_course_rows(term_id, sections, evaluation_keys_to_instructor_uids, dept_forms_to_uids, all_catalog_listings)
+        _generate_course_rows(term_id, sections, evaluation_keys_to_instructor_uids, dept_forms_to_uids, catalog_listing_matcher)
 
     course_instructors = list(csv.DictReader(stream_object_text(f'{past_term_export_path}/course_instructors.csv') or []))
     course_instructors.extend(current_term_course_instructors)
@@ -138,7 +138,7 @@ def upload(sftp, term_id, timestamp, filename, headers, rows):
         raise RuntimeError(f'Could not upload {filename}.csv')
 
 
-def _generate_course_rows(term_id, sections, keys_to_instructor_uids, dept_forms_to_uids, all_catalog_listings):
+def _generate_course_rows(term_id, sections, keys_to_instructor_uids, dept_forms_to_uids, catalog_listing_matcher):
     course_rows = []
     course_instructor_rows = []
     course_student_rows = []
@@ -169,7 +169,7 @@ def _generate_course_rows(term_id, sections, keys_to_instructor_uids, dept_forms
             for supervisor_uid in dept_forms_to_uids.get(key.department_form, []):
                 course_supervisor_rows.append({'COURSE_ID': course_ids[key], 'LDAP_UID': supervisor_uid, 'DEPT_NAME': key.department_form})
             xlisted_course_supervisor_rows.extend(
-                _generate_xlisted_course_supervisor_rows(course_ids[key], course_number, sections, dept_forms_to_uids, all_catalog_listings))
+                _generate_xlisted_course_supervisor_rows(course_ids[key], course_number, sections, dept_forms_to_uids, catalog_listing_matcher))
 
     student_rows = [_export_student_row(v) for v in students_by_uid.values()]
 
@@ -194,7 +194,7 @@ def _generate_course_id_map(keys, course_number, term_id):
         return course_id_map
 
 
-def _generate_evaluation_maps(term_id):
+def _generate_evaluation_maps(term_id, catalog_listing_matcher):
     evaluations = {}
     instructors = {}
     sections = {}
@@ -202,7 +202,11 @@ def _generate_evaluation_maps(term_id):
     db_evals = Evaluation.get_confirmed(term_id)
 
     for dept_id, dept_evals in groupby(db_evals, key=lambda e: e.department_id):
-        department_exports = Department.find_by_id(dept_id).get_evaluation_exports(term_id, evaluation_ids=[e.id for e in dept_evals])
+        department_exports = Department.find_by_id(dept_id).get_evaluation_exports(
+            term_id,
+            evaluation_ids=[e.id for e in dept_evals],
+            catalog_listing_matcher=catalog_listing_matcher,
+        )
         instructors.update(department_exports['instructors'])
         sections.update(department_exports['sections'])
 
@@ -258,7 +262,7 @@ def _generate_course_instructor_rows(course_id, instructor_uids, evaluation_type
     return rows
 
 
-def _generate_xlisted_course_supervisor_rows(course_id, course_number, sections, dept_forms_to_uids, all_catalog_listings):
+def _generate_xlisted_course_supervisor_rows(course_id, course_number, sections, dept_forms_to_uids, catalog_listing_matcher):
     rows = []
     cln = _cross_listed_name(sections[course_number])
     if cln:
@@ -266,7 +270,7 @@ def _generate_xlisted_course_supervisor_rows(course_id, course_number, sections,
         for n in cln.split('-'):
             catalog_listing = None
             try:
-                catalog_listing = sections[n].find_catalog_listing(all_catalog_listings)
+                catalog_listing = sections[n].find_catalog_listing(catalog_listing_matcher)
             except KeyError as e:
                 app.logger.error(
                     f'Error exporting xlisted course supervisors: course_number={course_number}, xlisted_name={cln}, error=KeyError: {e}',
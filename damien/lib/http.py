@@ -25,7 +25,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 
 import urllib
 
-from flask import Response
+from flask import Response, stream_with_context
 import simplejson as json
 
 
@@ -36,6 +36,39 @@ def add_param_to_url(url, param):
     return urllib.parse.urlunparse(parsed_url._replace(query=urllib.parse.urlencode(parsed_query)))
 
 
+def gzipped_json_response(payload, status=200):
+    """Send JSON that is already gzip-compressed, for clients that accept gzip encoding."""
+    response = Response(payload, mimetype='application/json', status=status)
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
 def tolerant_jsonify(obj, status=200, **kwargs):
     content = json.dumps(obj, ignore_nan=True, separators=(',', ':'), **kwargs)
     return Response(content, mimetype='application/json', status=status)
+
+
+def tolerant_jsonify_stream(chunks, wrapper=None, key=None, status=200):
+    """Stream a JSON array whose items arrive in chunks (lists), encoding one chunk at a time.
+
+    If a wrapper object is given, the array is streamed as the value of wrapper[key].
+    """
+    def _generator():
+        if wrapper is not None:
+            head = _dumps({k: v for k, v in wrapper.items() if k != key})
+            yield f"{head[:-1]}{',' if len(head) > 2 else ''}{_dumps(key)}:"
+        yield '['
+        separator = ''
+        for chunk in chunks:
+            if len(chunk):
+                yield separator + _dumps(chunk)[1:-1]
+                separator = ','
+        yield ']'
+        if wrapper is not None:
+            yield '}'
+    return Response(stream_with_context(_generator()), mimetype='application/json', status=status)
+
+
+def _dumps(obj):
+    return json.dumps(obj, ignore_nan=True, separators=(',', ':'))
@@ -0,0 +1,64 @@
+"""
+Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import os
+
+from damien import db
+from damien.lib.util import resolve_sql_template
+from flask import current_app as app
+from sqlalchemy.sql import text
+
+# Upstream tables loaded for each refreshed term, as created by create_loch_sources.template.sql.
+SOURCE_TABLES = ['sis_terms', 'sis_sections', 'sis_instructors', 'sis_enrollments', 'course_listings']
+
+
+def load_loch_sources(term_id):
+    """Load upstream SIS rows for the term into temporary loch_source_* tables, using the configured LOCH_SOURCE backend."""
+    db.session().execute(text(resolve_sql_template('create_loch_sources.template.sql')))
+    source = app.config['LOCH_SOURCE']
+    if source == 'dblink':
+        db.session().execute(text(resolve_sql_template('load_loch_sources_dblink.template.sql', term_id=term_id)))
+    elif source == 'snapshot':
+        for table in SOURCE_TABLES:
+            _copy_snapshot(f'loch_source_{table}', os.path.join(app.config['LOCH_SNAPSHOT_PATH'], term_id, f'{table}.csv'))
+    else:
+        raise ValueError(f'Unknown loch source: {source}')
+    counts = {table: db.session().execute(text(f'SELECT COUNT(*) FROM loch_source_{table}')).scalar() for table in SOURCE_TABLES}
+    app.logger.info(f'Loaded loch sources from {source} (term_id={term_id}): {counts}')
+    return counts
+
+
+def load_basic_attributes_snapshot():
+    """Replace the contents of unholy_loch.basic_attributes with basic attributes from the snapshot."""
+    db.session().execute(text('TRUNCATE TABLE unholy_loch.basic_attributes'))
+    return _copy_snapshot('unholy_loch.basic_attributes', os.path.join(app.config['LOCH_SNAPSHOT_PATH'], 'basic_attributes.csv'))
+
+
+def _copy_snapshot(table, path):
+    # COPY FROM STDIN streams the file over the session's own connection, so the file need only be readable by the app.
+    cursor = db.session().connection().connection.cursor()
+    with open(path, encoding='utf-8') as file:
+        cursor.copy_expert(f'COPY {table} FROM STDIN WITH (FORMAT csv, HEADER true)', file)
+    return cursor.rowcount
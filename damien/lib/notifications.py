@@ -0,0 +1,138 @@
+"""
+Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import select
+from threading import Lock, Thread
+import time
+
+from damien import db
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+"""
+Workers share cache invalidations over a Postgres notification channel. A write publishes a topic such as 'json_cache:2222:66' or
+'tool_setting:REFERENCE_DATA_VERSION' within its transaction, so that the notification is delivered when, and only if, the
+transaction commits. A listener thread in each worker counts the notifications received per topic. In-process caches key
+their entries by generation(topic), and can skip the database check for as long as the listener stays connected.
+"""
+
+CHANNEL = 'damien_cache'
+POLL_SECONDS = 5
+RECONNECT_SECONDS = 10
+
+_counters = {}
+_lock = Lock()
+_listener = None
+_subscribers = {}
+
+
+def generation(topic):
+    # None unless a listener is connected, in which case the value changes with every notification on the topic and on every
+    # reconnection, since notifications sent while disconnected are lost.
+    listener = _listener
+    if listener is None or not listener.listening:
+        return None
+    return listener.connections, _counters.get(topic, 0)
+
+
+def initialize_listener(app):
+    global _listener
+    if app.config['CACHE_NOTIFICATIONS_ENABLED'] and _listener is None:
+        _listener = _Listener(app)
+        _listener.start()
+
+
+def publish(name, argument=None, connection=None):
+    topic = name if argument is None else f'{name}:{argument}'
+    (connection or db.session).execute(text('SELECT pg_notify(:channel, :topic)'), {'channel': CHANNEL, 'topic': topic})
+    # The publishing worker applies its own notification as soon as the transaction commits, without waiting for the listener.
+    db.session().info.setdefault('pending_notifications', set()).add(topic)
+
+
+def subscribe(name, callback):
+    """Call back with the topic argument on every notification for the name, and with None after a listener reconnection."""
+    _subscribers.setdefault(name, []).append(callback)
+
+
+def _receive(topic):
+    with _lock:
+        _counters[topic] = _counters.get(topic, 0) + 1
+    name, _, argument = topic.partition(':')
+    for callback in _subscribers.get(name, []):
+        callback(argument or None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _receive_pending_after_commit(session):
+    for topic in sorted(session.info.pop('pending_notifications', ())):
+        _receive(topic)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_after_rollback(session):
+    session.info.pop('pending_notifications', None)
+
+
+class _Listener(Thread):
+
+    def __init__(self, app):
+        super().__init__(name='cache_notifications', daemon=True)
+        self.app = app
+        self.connections = 0
+        self.listening = False
+
+    def run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self._listen()
+                except Exception as e:
+                    self.app.logger.error('Cache notification listener disconnected')
+                    self.app.logger.exception(e)
+                self.listening = False
+                time.sleep(RECONNECT_SECONDS)
+
+    def _listen(self):
+        connection = psycopg2.connect(db.engine.url.render_as_string(hide_password=False))
+        try:
+            connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self.connections += 1
+            self.listening = True
+            self.app.logger.info(f'Listening for cache notifications on {CHANNEL}')
+            for callbacks in list(_subscribers.values()):
+                for callback in callbacks:
+                    callback(None)
+            while True:
+                if select.select([connection], [], [], POLL_SECONDS) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    _receive(connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
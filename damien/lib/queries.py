@@ -28,6 +28,7 @@ import os
 
 from damien import db
 from damien.lib.util import parse_search_snippet
+from damien.models.tool_setting import ToolSetting
 from flask import current_app as app
 from sqlalchemy.sql import text
 
@@ -51,29 +52,42 @@ def refresh_additional_instructors(uids=None):
         (SELECT ldap_uid FROM unholy_loch.sis_instructors)"""
 
     uids_to_refresh = [r['instructor_uid'] for r in db.session().execute(text(uid_query), uid_params).all()]
+    if not uids_to_refresh:
+        return True
 
-    refresh_query = f"""INSERT INTO unholy_loch.sis_instructors
-        (ldap_uid, sis_id, first_name, last_name, email_address, affiliations, created_at)
-        (SELECT * FROM dblink('{app.config['DBLINK_NESSIE_RDS']}',$NESSIE$
-          SELECT DISTINCT
-            ba.ldap_uid, ba.sid AS sis_id, ba.first_name, ba.last_name, ba.email_address, ba.affiliations,
-            now() AS created_at
-          FROM sis_data.basic_attributes ba
-          WHERE ba.ldap_uid = ANY(:uids_to_refresh)
-          $NESSIE$)
-          AS nessie_sis_instructors (
-            ldap_uid VARCHAR(80),
-            sis_id VARCHAR(80),
-            first_name VARCHAR(255),
-            last_name VARCHAR(255),
-            email_address VARCHAR(255),
-            affiliations TEXT,
-            created_at TIMESTAMP WITH TIME ZONE
-          )
-        )"""
+    if app.config['LOCH_SOURCE'] == 'snapshot':
+        refresh_query = """INSERT INTO unholy_loch.sis_instructors
+            (ldap_uid, sis_id, first_name, last_name, email_address, affiliations, created_at)
+            (SELECT DISTINCT ldap_uid, sid, first_name, last_name, email_address, affiliations, now()
+              FROM unholy_loch.basic_attributes
+              WHERE ldap_uid = ANY(:uids_to_refresh)
+            )"""
+    else:
+        refresh_query = f"""INSERT INTO unholy_loch.sis_instructors
+            (ldap_uid, sis_id, first_name, last_name, email_address, affiliations, created_at)
+            (SELECT * FROM dblink('{app.config['DBLINK_NESSIE_RDS']}',$NESSIE$
+              SELECT DISTINCT
+                ba.ldap_uid, ba.sid AS sis_id, ba.first_name, ba.last_name, ba.email_address, ba.affiliations,
+                now() AS created_at
+              FROM sis_data.basic_attributes ba
+              WHERE ba.ldap_uid = ANY(:uids_to_refresh)
+              $NESSIE$)
+              AS nessie_sis_instructors (
+                ldap_uid VARCHAR(80),
+                sis_id VARCHAR(80),
+                first_name VARCHAR(255),
+                last_name VARCHAR(255),
+                email_address VARCHAR(255),
+                affiliations TEXT,
+                created_at TIMESTAMP WITH TIME ZONE
+              )
+            )"""
 
     try:
-        db.session().execute(text(refresh_query), {'uids_to_refresh': uids_to_refresh})
+        result = db.session().execute(text(refresh_query), {'uids_to_refresh': uids_to_refresh})
+        # Workers reload the whole instructor directory when its version changes, so bump it only if instructors were added.
+        if result.rowcount:
+            ToolSetting.bump_version('INSTRUCTOR_DIRECTORY_VERSION')
         return True
     except Exception as e:
         app.logger.exception(e)
@@ -230,18 +244,12 @@ def get_room_shares(term_id, course_numbers):
     return results
 
 
-def get_loch_instructors(uids):
-    if not len(uids):
-        return []
-    query = """SELECT distinct *
-            FROM unholy_loch.sis_instructors i
-            WHERE ldap_uid = ANY(:uids)
+def get_all_loch_instructors():
+    query = """SELECT DISTINCT ldap_uid, sis_id, first_name, last_name, email_address, affiliations
+            FROM unholy_loch.sis_instructors
         """
-    results = db.session().execute(
-        text(query),
-        {'uids': uids},
-    ).all()
-    app.logger.info(f'Unholy loch instructor query returned {len(results)} results for {len(uids)} uids')
+    results = db.session().execute(text(query)).all()
+    app.logger.info(f'Unholy loch all instructors query returned {len(results)} results')
     return results
 
 
@@ -259,6 +267,62 @@ def get_loch_instructors_for_snippet(snippet, limit, exclude_uids):
     return db.session().execute(text(query), params).all()
 
 
+def refresh_department_sections(term_id, department_id, conditions):
+    params = {'term_id': term_id, 'department_id': department_id}
+    db.session().execute(
+        text('DELETE FROM department_sections WHERE term_id = :term_id AND department_id = :department_id'),
+        params,
+    )
+    # The refresh is recorded even when no sections match, so that readers can tell an empty department from one not yet refreshed.
+    db.session().execute(
+        text("""INSERT INTO department_section_refreshes (term_id, department_id) VALUES (:term_id, :department_id)
+            ON CONFLICT (term_id, department_id) DO UPDATE SET refreshed_at = now()"""),
+        params,
+    )
+    if not len(conditions):
+        return 0
+    query = f"""INSERT INTO department_sections (term_id, department_id, course_number)
+            SELECT DISTINCT s.term_id, :department_id, s.course_number
+            FROM unholy_loch.sis_sections s
+            WHERE s.term_id = :term_id AND ({' OR '.join(conditions)})
+            ON CONFLICT DO NOTHING
+        """
+    result = db.session().execute(text(query), params)
+    app.logger.info(f'Department sections refresh inserted {result.rowcount} rows: {query} {params}')
+    return result.rowcount
+
+
+def get_section_changes(term_id):
+    query = """SELECT course_number, instructor_uid, change
+        FROM unholy_loch.sis_section_changes
+        WHERE term_id = :term_id AND consumed_at IS NULL"""
+    return db.session().execute(text(query), {'term_id': term_id}).all()
+
+
+def consume_section_changes(term_id):
+    query = """UPDATE unholy_loch.sis_section_changes SET consumed_at = now()
+        WHERE term_id = :term_id AND consumed_at IS NULL"""
+    return db.session().execute(text(query), {'term_id': term_id}).rowcount
+
+
+def get_section_department_ids(term_id, course_numbers):
+    if not course_numbers:
+        return []
+    query = """SELECT department_id FROM department_sections
+            WHERE term_id = :term_id AND course_number = ANY(:course_numbers)
+        UNION SELECT department_id FROM supplemental_sections
+            WHERE term_id = :term_id AND course_number = ANY(:course_numbers)
+        UNION SELECT department_id FROM evaluations
+            WHERE term_id = :term_id AND course_number = ANY(:course_numbers) AND department_id IS NOT NULL"""
+    results = db.session().execute(text(query), {'term_id': term_id, 'course_numbers': list(course_numbers)}).all()
+    return [r.department_id for r in results]
+
+
+def is_department_sections_refreshed(term_id, department_id):
+    query = 'SELECT 1 FROM department_section_refreshes WHERE term_id = :term_id AND department_id = :department_id'
+    return db.session().execute(text(query), {'term_id': term_id, 'department_id': department_id}).first() is not None
+
+
 def get_loch_sections(term_id, conditions):
     query = f"""SELECT DISTINCT
                 s.*,
@@ -282,6 +346,33 @@ def get_loch_sections(term_id, conditions):
     return results
 
 
+def get_loch_sections_by_department(term_id, department_id):
+    query = """SELECT DISTINCT
+                s.*,
+                cl.cross_listing_number AS cross_listed_with,
+                cs.room_share_number AS room_shared_with
+            FROM department_sections ds
+            JOIN unholy_loch.sis_sections s
+                ON s.term_id = ds.term_id
+                AND s.course_number = ds.course_number
+            LEFT JOIN unholy_loch.cross_listings cl
+                ON cl.term_id = s.term_id
+                AND s.course_number = cl.course_number
+            LEFT JOIN unholy_loch.co_schedulings cs
+                ON cs.term_id = s.term_id
+                AND s.course_number = cs.course_number
+            WHERE ds.term_id = :term_id AND ds.department_id = :department_id
+            ORDER BY s.course_number, s.instructor_uid
+        """
+    params = {'term_id': term_id, 'department_id': department_id}
+    results = db.session().execute(
+        text(query),
+        params,
+    ).all()
+    app.logger.info(f'Unholy loch course by department query returned {len(results)} results: {query} {params}')
+    return results
+
+
 def get_loch_sections_by_ids(term_id, course_numbers):
     if not len(course_numbers):
         return []
@@ -0,0 +1,167 @@
+"""
+Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from threading import Lock
+
+from damien import db
+from damien.lib import notifications
+from damien.lib.queries import get_all_loch_instructors
+from damien.models.department_catalog_listing import CatalogListingMatcher, DepartmentCatalogListing
+from damien.models.department_form import DepartmentForm
+from damien.models.evaluation_type import EvaluationType
+from damien.models.supplemental_instructor import SupplementalInstructor
+from damien.models.tool_setting import ToolSetting
+from flask import current_app as app
+from sqlalchemy.orm import joinedload, Session
+
+"""
+Department forms, evaluation types, catalog listings and instructor names change rarely but are read on every department feed.
+Each worker keeps them in memory, tagged with a version id stored in tool_settings. Writes to the underlying tables bump the
+version, and a worker reloads when the version it reads no longer matches its copy. While the worker listens for cache
+notifications, the version is only read again after a notification on its key.
+
+Cached rows are detached from any session and must be treated as read-only. Merge them into the session before assigning
+them to a mapped relationship.
+"""
+
+INSTRUCTOR_DIRECTORY_VERSION = 'INSTRUCTOR_DIRECTORY_VERSION'
+REFERENCE_DATA_VERSION = 'REFERENCE_DATA_VERSION'
+
+
+class ReferenceData:
+
+    def __init__(self, department_forms, evaluation_types, catalog_listings):
+        self.department_forms = department_forms
+        self.evaluation_types = evaluation_types
+        self.catalog_listings = catalog_listings
+        self.catalog_listing_matcher = CatalogListingMatcher(catalog_listings)
+        self.department_forms_by_name = {df.name: df for df in department_forms if not df.deleted_at}
+        self.evaluation_types_by_name = {et.name: et for et in evaluation_types}
+
+
+class VersionedCache:
+
+    def __init__(self, version_key, load):
+        self.version_key = version_key
+        self.load = load
+        self.lock = Lock()
+        self.cached = None
+
+    def get(self):
+        # Taken before the version is read, so that a notification arriving during a reload leaves the copy unconfirmed.
+        generation = notifications.generation(f'tool_setting:{self.version_key}')
+        cached = self.cached
+        if generation is not None and cached is not None and cached[2] == generation:
+            return cached[1]
+        version = ToolSetting.get_version(self.version_key)
+        if cached is None or cached[0] != version:
+            with self.lock:
+                if self.cached is None or self.cached[0] != version:
+                    self.cached = (version, self.load(version), generation)
+                cached = self.cached
+        elif generation is not None:
+            self.cached = cached = (cached[0], cached[1], generation)
+        return cached[1]
+
+
+def get_catalog_listing_matcher():
+    return _reference_data.get().catalog_listing_matcher
+
+
+def get_department_form_by_name(name):
+    return _reference_data.get().department_forms_by_name.get(name)
+
+
+def get_department_forms(include_deleted=False):
+    return [df for df in _reference_data.get().department_forms if include_deleted or not df.deleted_at]
+
+
+def get_evaluation_types(include_deleted=False):
+    return [et for et in _reference_data.get().evaluation_types if include_deleted or not et.deleted_at]
+
+
+def get_evaluation_types_by_name():
+    return _reference_data.get().evaluation_types_by_name
+
+
+def get_instructors(uids):
+    directory = _instructor_directory.get()
+    instructors = {}
+    for uid in uids:
+        instructors[uid] = directory.get(uid) or {
+            'uid': uid,
+            'sisId': None,
+            'firstName': None,
+            'lastName': None,
+            'emailAddress': None,
+        }
+    return instructors
+
+
+def _load_instructor_directory(version):
+    # Supplemental instructors take precedence over SIS data.
+    directory = {}
+    for row in get_all_loch_instructors():
+        directory[row['ldap_uid']] = {
+            'uid': row['ldap_uid'],
+            'sisId': row['sis_id'],
+            'firstName': row['first_name'],
+            'lastName': row['last_name'],
+            'emailAddress': row['email_address'],
+            'affiliations': row['affiliations'],
+        }
+    for i in SupplementalInstructor.find_all():
+        directory[i.ldap_uid] = {
+            'uid': i.ldap_uid,
+            'sisId': i.sis_id,
+            'firstName': i.first_name,
+            'lastName': i.last_name,
+            'emailAddress': i.email_address,
+        }
+    app.logger.info(f'Loaded instructor directory (version={version}): {len(directory)} instructors')
+    return directory
+
+
+def _load_reference_data(version):
+    # Load through a separate session on the same connection, so that cached rows neither come from nor are removed from
+    # the identity map of the request session.
+    session = Session(bind=db.session.connection())
+    try:
+        department_forms = session.query(DepartmentForm).order_by(DepartmentForm.name).all()
+        evaluation_types = session.query(EvaluationType).order_by(EvaluationType.name).all()
+        catalog_listings = session.query(DepartmentCatalogListing).options(
+            joinedload(DepartmentCatalogListing.default_form),
+        ).order_by(DepartmentCatalogListing.id).all()
+        session.expunge_all()
+    finally:
+        session.close()
+    app.logger.info(
+        f'Loaded reference data (version={version}): {len(department_forms)} department forms, {len(evaluation_types)} evaluation types, '
+        f'{len(catalog_listings)} catalog listings')
+    return ReferenceData(department_forms, evaluation_types, catalog_listings)
+
+
+_instructor_directory = VersionedCache(INSTRUCTOR_DIRECTORY_VERSION, _load_instructor_directory)
+_reference_data = VersionedCache(REFERENCE_DATA_VERSION, _load_reference_data)
@@ -24,11 +24,10 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from itertools import groupby
-import re
 
 from damien.lib.cache import fetch_section_cache, set_section_cache
 from damien.lib.queries import get_loch_sections_by_ids
-from damien.models.evaluation import Evaluation
+from damien.models.evaluation import TransientEvaluation
 
 
 class Section:
@@ -37,10 +36,11 @@ class Section:
         self,
         loch_rows,
         evaluations=(),
-        catalog_listings=(),
+        catalog_listing_matcher=None,
         evaluation_types=None,
         instructors=None,
         visible_course_numbers=None,
+        duplicate_resolver=None,
     ):
         self.term_id = loch_rows[0].term_id
         self.course_number = loch_rows[0].course_number
@@ -57,9 +57,10 @@ class Section:
         self.loch_rows = loch_rows
         self.evaluations = evaluations
         self.instructors = instructors or {}
+        self.duplicate_resolver = duplicate_resolver
 
         self.set_cross_listed_status(loch_rows, visible_course_numbers)
-        self.set_defaults(catalog_listings, evaluation_types)
+        self.set_defaults(catalog_listing_matcher, evaluation_types)
 
     def __repr__(self):
         return f"""<Section term_id={self.term_id},
@@ -115,21 +116,12 @@ class Section:
         self.cross_listed_with = sorted(self.cross_listed_with)
         self.room_shared_with = sorted(self.room_shared_with)
 
-    def find_catalog_listing(self, catalog_listings):
-        candidate_catalog_listings = list(
-            c for c in catalog_listings
-            if c.subject_area in (self.subject_area, '') and (c.catalog_id is None or re.match(f'^{c.catalog_id}$', self.catalog_id))
-        )
-        # Exact matches on catalog id take precedence.
-        exact_catalog_id_match = next((c for c in candidate_catalog_listings if c.catalog_id and re.match(c.catalog_id, self.catalog_id)), None)
-        if exact_catalog_id_match:
-            return exact_catalog_id_match
-        # Otherwise return any match on subject area.
-        elif len(candidate_catalog_listings):
-            return candidate_catalog_listings[0]
+    def find_catalog_listing(self, catalog_listing_matcher):
+        if catalog_listing_matcher:
+            return catalog_listing_matcher.find(self.subject_area, self.catalog_id)
 
-    def set_defaults(self, catalog_listings, evaluation_types):
-        catalog_listing = self.find_catalog_listing(catalog_listings)
+    def set_defaults(self, catalog_listing_matcher, evaluation_types):
+        catalog_listing = self.find_catalog_listing(catalog_listing_matcher)
 
         # Apply a default form value to courses not cross-listed or room shared.
         if catalog_listing and not self.cross_listed_with and not self.room_shared_with:
@@ -237,7 +229,7 @@ class Section:
             else:
                 evals_key = evaluation.instructor_uid
 
-            merged_evaluations.append(Evaluation.merge_transient(
+            merged_evaluations.append(TransientEvaluation.merge(
                 evaluation.instructor_uid,
                 loch_rows_for_uid,
                 saved_evaluation=evaluation,
@@ -245,6 +237,7 @@ class Section:
                 instructor=self.instructors.get(evaluation.instructor_uid),
                 default_form=self.default_form,
                 default_evaluation_types=self.default_evaluation_types,
+                duplicate_resolver=self.duplicate_resolver,
             ))
 
     def merge_loch_evaluations(
@@ -266,7 +259,7 @@ class Section:
             eval_key = f'{instructor_uid}-final' if instructor_uid in self.uids_with_midterm_and_final else instructor_uid
             merged_evaluation_uids.add(eval_key)
 
-            merged_evaluations.append(Evaluation.merge_transient(
+            merged_evaluations.append(TransientEvaluation.merge(
                 instructor_uid,
                 loch_rows_for_uid,
                 saved_evaluation=None,
@@ -296,7 +289,7 @@ class Section:
                 instructor_uid = None
             loch_rows_for_uid = loch_rows_by_instructor_uid.get(instructor_uid) or loch_rows_by_instructor_uid.get(None) or self.loch_rows
 
-            merged_evaluations.append(Evaluation.merge_transient(
+            merged_evaluations.append(TransientEvaluation.merge(
                 instructor_uid,
                 loch_rows_for_uid,
                 saved_evaluation=None,
@@ -336,7 +329,7 @@ class Section:
             exports[export_key].add(e.instructor_uid)
         return exports
 
-    def get_evaluation_feed(self, department_id, uses_midterm_forms, sections_cache=None, evaluation_ids=None):
+    def get_evaluation_feed(self, department_id, uses_midterm_forms, sections_cache=None, evaluation_ids=None, regenerated_sections=None):
         if sections_cache:
             evaluation_feed = sections_cache.get(self.course_number)
         else:
@@ -344,20 +337,29 @@ class Section:
 
         if not evaluation_feed:
             merged_evaluations = self.merge_evaluations(department_id=department_id, uses_midterm_forms=uses_midterm_forms)
-            evaluation_feed = [e.to_api_json(section=self) for e in merged_evaluations]
-            set_section_cache(department_id, self.term_id, self.course_number, evaluation_feed)
-
-        if evaluation_ids:
-            evaluation_feed = [e for e in evaluation_feed if e['id'] in evaluation_ids]
-
-        def _sort_key(evaluation):
-            course_number = evaluation.get('courseNumber', '')
-            evaluation_type = (evaluation.get('evaluationType') or {}).get('name', '')
-            department_form = (evaluation.get('departmentForm') or {}).get('name', '')
-            instructor = evaluation.get('instructor')
-            instructor_name = f"{instructor.get('lastName', '')}, {instructor.get('firstName', '')}" if instructor else ''
-            start_date = evaluation.get('startDate', '')
-            return f'{course_number}_{evaluation_type}_{department_form}_{instructor_name}_{start_date}'
-
-        evaluation_feed.sort(key=_sort_key)
-        return evaluation_feed
+            # Feeds are cached in sorted order, so that a cached feed can be served as stored.
+            evaluation_feed = sort_evaluation_feed([e.to_api_json(section=self) for e in merged_evaluations])
+            # A caller regenerating many sections may collect them for a single bulk write.
+            if regenerated_sections is None:
+                set_section_cache(department_id, self.term_id, self.course_number, evaluation_feed)
+            else:
+                regenerated_sections[self.course_number] = list(evaluation_feed)
+
+        return sort_evaluation_feed(evaluation_feed, evaluation_ids)
+
+
+def sort_evaluation_feed(evaluation_feed, evaluation_ids=None):
+    if evaluation_ids:
+        evaluation_feed = [e for e in evaluation_feed if e['id'] in evaluation_ids]
+
+    def _sort_key(evaluation):
+        course_number = evaluation.get('courseNumber', '')
+        evaluation_type = (evaluation.get('evaluationType') or {}).get('name', '')
+        department_form = (evaluation.get('departmentForm') or {}).get('name', '')
+        instructor = evaluation.get('instructor')
+        instructor_name = f"{instructor.get('lastName', '')}, {instructor.get('firstName', '')}" if instructor else ''
+        start_date = evaluation.get('startDate', '')
+        return f'{course_number}_{evaluation_type}_{department_form}_{instructor_name}_{start_date}'
+
+    evaluation_feed.sort(key=_sort_key)
+    return evaluation_feed
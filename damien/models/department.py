@@ -27,21 +27,28 @@ from itertools import groupby
 
 from damien import db, std_commit
 from damien.lib.berkeley import get_current_term_id
-from damien.lib.cache import clear_department_cache, fetch_all_sections, fetch_department_cache, set_department_cache
-from damien.lib.queries import get_cross_listings, get_loch_instructors, get_loch_sections, get_loch_sections_by_ids, get_room_shares
+from damien.lib.cache import clear_department_cache, fetch_all_sections, fetch_cached_course_numbers, fetch_department_cache, \
+    fetch_department_summary, fetch_section_cache, fetch_sections_cache, set_department_cache, set_sections_cache
+from damien.lib.queries import get_cross_listings, get_loch_sections, get_loch_sections_by_department, get_loch_sections_by_ids, \
+    get_room_shares, is_department_sections_refreshed, refresh_department_sections
+from damien.lib.reference_data import get_catalog_listing_matcher, get_evaluation_types_by_name, get_instructors
 from damien.lib.util import extract_int, isoformat
-from damien.merged.section import Section
+from damien.merged.section import Section, sort_evaluation_feed
 from damien.models.base import Base
 from damien.models.department_catalog_listing import DepartmentCatalogListing
-from damien.models.evaluation import Evaluation
-from damien.models.evaluation_type import EvaluationType
-from damien.models.supplemental_instructor import SupplementalInstructor
+from damien.models.evaluation import DuplicateResolver, Evaluation
 from damien.models.supplemental_section import SupplementalSection
+from damien.models.util import advisory_key_lock
 from flask import current_app as app
 from sqlalchemy import text
 from sqlalchemy.orm import joinedload
 
 
+DEPARTMENT_FEED_LOCK_ID = 667
+SECTION_FEED_LOCK_ID = 668
+SECTION_CACHE_BATCH_SIZE = 100
+
+
 class Department(Base):
     __tablename__ = 'departments'
 
@@ -105,6 +112,12 @@ class Department(Base):
         query = cls.query.filter_by(dept_name=dept_name)
         return query.first()
 
+    @classmethod
+    def refresh_all_sections(cls, term_id):
+        for department in cls.query.all():
+            department.refresh_sections(term_id)
+        std_commit()
+
     @classmethod
     def all_enrolled(cls, load_contacts=False):
         query = cls.query.filter_by(is_enrolled=True).order_by(cls.dept_name)
@@ -128,6 +141,22 @@ class Department(Base):
         return DepartmentCatalogListing.department_terms(self.id)
 
     def get_department_sections(self, term_id):
+        # Membership is materialized at loch refresh, and refreshed along with any change to catalog listings. For terms never
+        # refreshed, sections are matched on the loch directly, so that reads never write.
+        if is_department_sections_refreshed(term_id, self.id):
+            sections = get_loch_sections_by_department(term_id, self.id)
+        else:
+            conditions = self._catalog_listing_conditions(term_id)
+            if not len(conditions):
+                return []
+            sections = get_loch_sections(term_id, conditions)
+        self.merge_cross_listings(sections, term_id)
+        return sorted(sections, key=lambda r: r['course_number'])
+
+    def refresh_sections(self, term_id):
+        return refresh_department_sections(term_id, self.id, self._catalog_listing_conditions(term_id))
+
+    def _catalog_listing_conditions(self, term_id):
         conditions = []
         for subject_area, catalog_ids in self.catalog_listings_map(term_id).items():
             subconditions = []
@@ -143,11 +172,7 @@ class Department(Base):
                 subconditions.append(f"s.catalog_id SIMILAR TO '({'|'.join(catalog_ids)})'")
             if len(subconditions):
                 conditions.append(f"({' AND '.join(subconditions)})")
-        if not len(conditions):
-            return []
-        sections = get_loch_sections(term_id, conditions)
-        self.merge_cross_listings(sections, term_id)
-        return sorted(sections, key=lambda r: r['course_number'])
+        return conditions
 
     def get_supplemental_sections(self, term_id):
         course_numbers = [r.course_number for r in SupplementalSection.for_term_and_department(term_id, self.id)]
@@ -163,7 +188,7 @@ class Department(Base):
         course_numbers.extend(list(set(s.course_number for s in room_shares if Section.is_visible_by_default(s))))
         sections.extend(get_cross_listings(term_id, course_numbers))
 
-    def get_visible_sections(self, term_id=None, section_id=None, include_empty_sections=False):
+    def get_visible_sections(self, term_id=None, section_id=None, include_empty_sections=False, catalog_listing_matcher=None):
         sections = []
         term_id = term_id or get_current_term_id()
 
@@ -185,9 +210,11 @@ class Department(Base):
 
         all_sections = default_loch_sections + supplemental_loch_sections
         evaluations = Evaluation.fetch_by_course_numbers(term_id, sections_by_number.keys())
+        # Duplicate checks during merge are resolved against the evaluations loaded above, rather than one query per saved evaluation.
+        duplicate_resolver = DuplicateResolver(e for v in evaluations.values() for e in v)
         instructors = _get_instructors(all_sections, evaluations)
-        all_eval_types = {et.name: et for et in EvaluationType.query.all()}
-        all_catalog_listings = DepartmentCatalogListing.query.all()
+        all_eval_types = get_evaluation_types_by_name()
+        catalog_listing_matcher = catalog_listing_matcher or get_catalog_listing_matcher()
 
         def _is_loch_row_visible(row):
             return (Section.is_visible_by_default(row, include_empty_sections)
@@ -209,21 +236,22 @@ class Department(Base):
             sections.append(Section(
                 visible_loch_rows,
                 section_evaluations,
-                all_catalog_listings,
+                catalog_listing_matcher,
                 all_eval_types,
                 instructors,
                 visible_course_numbers,
+                duplicate_resolver,
             ))
 
         return {'sections': sections, 'instructors': instructors}
 
-    def get_evaluation_exports(self, term_id, evaluation_ids):
+    def get_evaluation_exports(self, term_id, evaluation_ids, catalog_listing_matcher=None):
         exports = {
             'evaluations': {},
             'instructors': {},
             'sections': {},
         }
-        vs = self.get_visible_sections(term_id, include_empty_sections=True)
+        vs = self.get_visible_sections(term_id, include_empty_sections=True, catalog_listing_matcher=catalog_listing_matcher)
         cached_department = self.fetch_summary_feed(term_id)
 
         for s in vs['sections']:
@@ -240,32 +268,100 @@ class Department(Base):
                     if uid not in exports['instructors']:
                         exports['instructors'][uid] = vs['instructors'].get(uid)
 
+        Evaluation.flush_validity_updates()
         return exports
 
     def evaluations_feed(self, term_id=None, section_id=None, evaluation_ids=None):
+        feed = []
+        for section_feed in self.evaluations_feed_by_section(term_id, section_id, evaluation_ids):
+            feed.extend(section_feed)
+        return feed
+
+    def evaluations_feed_by_section(self, term_id=None, section_id=None, evaluation_ids=None):
+        # Return the evaluations feed as an iterable of section feeds, so that large feeds can be streamed to the client. Any
+        # regeneration is written and committed before this returns, so that nothing is left to write once streaming starts.
         term_id = term_id or get_current_term_id()
-        sections_cache = fetch_all_sections(self.id, term_id)
+        cached_feed = self._get_cached_feed(term_id, section_id, evaluation_ids)
+        if cached_feed is not None:
+            app.logger.debug(f'Returning cached evaluations feed (dept_id={self.id}, term_id={term_id}, evaluation_ids={evaluation_ids}')
+            return cached_feed
+
+        # Only one request at a time regenerates a given department or section. Others wait for it to commit, then read its result.
+        # The lock is held on its own connection, so the commits made while regenerating do not release it early.
+        lock_id, lock_key = (SECTION_FEED_LOCK_ID, f'{term_id}:{section_id}') if section_id else (DEPARTMENT_FEED_LOCK_ID, f'{term_id}:{self.id}')
+        with advisory_key_lock(lock_id, lock_key, app.config['EVALUATION_FEED_LOCK_TIMEOUT']) as granted:
+            if granted is not True:
+                app.logger.debug(f'Waited for evaluations feed regeneration (dept_id={self.id}, term_id={term_id}, section_id={section_id})')
+                cached_feed = self._get_cached_feed(term_id, section_id, evaluation_ids)
+                if cached_feed is not None:
+                    return cached_feed
+            return self._regenerate_feed(term_id, section_id, evaluation_ids)
+
+    def _regenerate_feed(self, term_id, section_id, evaluation_ids):
         uses_midterm_forms = self.uses_midterm_forms(term_id)
         app.logger.debug(
             f'Generating evaluations feed (dept_id={self.id}, term_id={term_id}, section_id={section_id}, evaluation_ids={evaluation_ids}')
-        feed = []
-
-        for s in self.get_visible_sections(term_id, section_id)['sections']:
-            feed.extend(
-                s.get_evaluation_feed(
-                    department_id=self.id,
-                    uses_midterm_forms=uses_midterm_forms,
-                    sections_cache=sections_cache,
-                    evaluation_ids=evaluation_ids,
-                ),
-            )
+        regenerated_sections = {}
+        sections, feed = self._generate_feed(term_id, section_id, evaluation_ids, uses_midterm_forms, regenerated_sections)
 
+        # Regenerated sections reflect current validity, so they are written after validity updates invalidate stale caches.
+        # Everything is committed together, before the regeneration lock is released to waiting requests.
+        Evaluation.flush_validity_updates(commit=False)
+        set_sections_cache(self.id, term_id, regenerated_sections, commit=False)
         if not section_id and not evaluation_ids:
-            self.cache_summary_feed(term_id, uses_midterm_forms, feed)
-
+            # Only status and validity are kept for the summary, rather than the whole feed.
+            summary_feed = [{'status': e['status'], 'valid': e['valid']} for section_feed in feed for e in section_feed]
+            self.cache_summary_feed(term_id, uses_midterm_forms, summary_feed, [s.course_number for s in sections])
+        else:
+            std_commit()
         return feed
 
-    def cache_summary_feed(self, term_id, uses_midterm_forms, feed):
+    def _generate_feed(self, term_id, section_id, evaluation_ids, uses_midterm_forms, regenerated_sections):
+        sections_cache = {} if section_id else fetch_all_sections(self.id, term_id)
+        sections = self.get_visible_sections(term_id, section_id)['sections']
+        feed = [
+            s.get_evaluation_feed(
+                department_id=self.id,
+                uses_midterm_forms=uses_midterm_forms,
+                sections_cache=sections_cache,
+                evaluation_ids=evaluation_ids,
+                regenerated_sections=regenerated_sections,
+            ) for s in sections
+        ]
+        return sections, feed
+
+    def _get_cached_feed(self, term_id, section_id, evaluation_ids):
+        # A section feed is cached as a whole. A department feed is cached if the summary knows which sections are visible and
+        # every one of them is cached, in which case no loch queries are needed.
+        if section_id:
+            section_feed = fetch_section_cache(self.id, term_id, section_id)
+            return None if section_feed is None else [sort_evaluation_feed(section_feed, evaluation_ids)]
+        department_cache = fetch_department_cache(self.id, term_id) or {}
+        visible_course_numbers = department_cache.get('visibleCourseNumbers')
+        if visible_course_numbers is None:
+            return None
+        cached_course_numbers = set(fetch_cached_course_numbers(self.id, term_id))
+        if all(c in cached_course_numbers for c in visible_course_numbers):
+            return self._read_cached_feed(term_id, visible_course_numbers, evaluation_ids, department_cache.get('usesMidtermForms'))
+
+    def _read_cached_feed(self, term_id, course_numbers, evaluation_ids, uses_midterm_forms):
+        # Cached sections are read a batch at a time as the feed is consumed, rather than all held in memory at once.
+        regenerated_feed = None
+        for i in range(0, len(course_numbers), SECTION_CACHE_BATCH_SIZE):
+            batch = course_numbers[i:i + SECTION_CACHE_BATCH_SIZE]
+            sections_cache = fetch_sections_cache(self.id, term_id, batch)
+            for course_number in batch:
+                section_feed = sections_cache.get(course_number)
+                if section_feed is None:
+                    # If a section is invalidated after the feed was found cached, the department is regenerated but not cached,
+                    # so that nothing is written while the feed is being consumed.
+                    if regenerated_feed is None:
+                        sections, feed = self._generate_feed(term_id, None, None, uses_midterm_forms, regenerated_sections={})
+                        regenerated_feed = {s.course_number: section_feed for s, section_feed in zip(sections, feed)}
+                    section_feed = regenerated_feed.get(course_number, [])
+                yield sort_evaluation_feed(section_feed, evaluation_ids)
+
+    def cache_summary_feed(self, term_id, uses_midterm_forms, feed, visible_course_numbers):
         feed = {
             'lastUpdated': isoformat(Evaluation.get_last_update(self.id, term_id)),
             'totalBlockers': len([e for e in feed if e['status'] == 'confirmed' and not e['valid']]),
@@ -273,19 +369,37 @@ class Department(Base):
             'totalInError': len([e for e in feed if not e['valid']]),
             'totalEvaluations': len(feed),
             'usesMidtermForms': uses_midterm_forms,
+            'visibleCourseNumbers': visible_course_numbers,
         }
         clear_department_cache(self.id, term_id)
         set_department_cache(self.id, term_id, feed)
         return feed
 
-    def fetch_summary_feed(self, term_id):
-        summary_feed = fetch_department_cache(self.id, term_id)
-        # A missing summary requires the underlying evaluations feed to be regenerated.
+    def fetch_summary_feed(self, term_id, allow_stale=False):
+        # A stale summary may be served while it is rebuilt in the background. A missing summary, or a stale one where stale
+        # is not allowed, requires the underlying evaluations feed to be regenerated.
+        if allow_stale:
+            summary_feed = fetch_department_summary(self.id, term_id)
+            if summary_feed and summary_feed.get('refreshing'):
+                self.queue_summary_rebuild(term_id)
+        else:
+            summary_feed = fetch_department_cache(self.id, term_id)
         if not summary_feed:
             self.evaluations_feed(term_id)
             summary_feed = fetch_department_cache(self.id, term_id)
         return summary_feed
 
+    def queue_summary_rebuild(self, term_id):
+        from damien.jobs.rebuild_summaries import queue_summary_rebuild
+        queue_summary_rebuild(self.id, term_id)
+
+    @classmethod
+    def rebuild_summary_feed(cls, department_id, term_id):
+        department = cls.find_by_id(department_id)
+        if department and not fetch_department_cache(department_id, term_id):
+            department.evaluations_feed(term_id)
+            app.logger.info(f'Rebuilt stale department summary (dept_id={department_id}, term_id={term_id})')
+
     def to_api_json(
         self,
         term_id,
@@ -298,7 +412,9 @@ class Department(Base):
     ):
         cached_department = departments_cache.get(self.id) if departments_cache else None
         if not cached_department:
-            cached_department = self.fetch_summary_feed(term_id)
+            cached_department = self.fetch_summary_feed(term_id, allow_stale=True)
+        elif cached_department.get('refreshing'):
+            self.queue_summary_rebuild(term_id)
 
         feed = {
             'id': self.id,
@@ -327,7 +443,7 @@ class Department(Base):
             feed['evaluations'] = evaluations
 
         if include_status:
-            feed.update(cached_department)
+            feed.update({k: v for k, v in cached_department.items() if k != 'visibleCourseNumbers'})
 
         if include_sections:
             feed['totalSections'] = cached_department.get('totalEvaluations')
@@ -358,33 +474,4 @@ def _get_instructors(all_sections, evaluations):
     instructor_uids = set(s['instructor_uid'] for s in all_sections if s['instructor_uid'] and s['instructor_uid'].strip())
     for v in evaluations.values():
         instructor_uids.update(e.instructor_uid for e in v if e.instructor_uid)
-    instructors = {}
-    for i in SupplementalInstructor.find_by_uids(list(instructor_uids)):
-        instructors[i.ldap_uid] = {
-            'uid': i.ldap_uid,
-            'sisId': i.sis_id,
-            'firstName': i.first_name,
-            'lastName': i.last_name,
-            'emailAddress': i.email_address,
-        }
-        instructor_uids.remove(i.ldap_uid)
-    loch_instructors = get_loch_instructors(list(instructor_uids))
-    for row in loch_instructors:
-        instructors[row['ldap_uid']] = {
-            'uid': row['ldap_uid'],
-            'sisId': row['sis_id'],
-            'firstName': row['first_name'],
-            'lastName': row['last_name'],
-            'emailAddress': row['email_address'],
-            'affiliations': row['affiliations'],
-        }
-        instructor_uids.remove(row['ldap_uid'])
-    for uid in instructor_uids:
-        instructors[uid] = {
-            'uid': uid,
-            'sisId': None,
-            'firstName': None,
-            'lastName': None,
-            'emailAddress': None,
-        }
-    return instructors
+    return get_instructors(instructor_uids)
@@ -23,11 +23,16 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import re
+
 from damien import db
 from damien.lib.berkeley import get_current_term_id, term_ids_range
+from damien.lib.cache import clear_department_cache, clear_department_section_cache
 from damien.models.base import Base
+from damien.models.tool_setting import ToolSetting
 from flask import current_app as app
-from sqlalchemy import func
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.orm import Session
 
 
 class DepartmentCatalogListing(Base):
@@ -89,3 +94,101 @@ class DepartmentCatalogListing(Base):
         for r in results:
             term_ids.extend(term_ids_range(*r))
         return sorted(list(set(term_ids)))
+
+
+@event.listens_for(DepartmentCatalogListing, 'after_insert')
+@event.listens_for(DepartmentCatalogListing, 'after_update')
+@event.listens_for(DepartmentCatalogListing, 'after_delete')
+def _clear_department_sections(mapper, connection, listing):
+    # A listing change affects its own department, plus departments whose wildcard listings exclude catalog ids in the same subject area,
+    # within the terms the listing covers before and after the change. Their materialized section membership is queued for refresh once
+    # the flush completes, and their cached feeds are invalidated.
+    history = inspect(listing).attrs
+    subject_areas = [listing.subject_area] + list(history.subject_area.history.deleted)
+    department_ids = set([listing.department_id] + list(history.department_id.history.deleted))
+    start_term_ids = [listing.start_term_id] + list(history.start_term_id.history.deleted)
+    end_term_ids = [listing.end_term_id] + list(history.end_term_id.history.deleted)
+    excluding_department_ids = connection.execute(
+        text("""SELECT DISTINCT department_id FROM department_catalog_listings
+            WHERE catalog_id IS NULL AND (subject_area = ANY(:subject_areas) OR '' = ANY(:subject_areas))"""),
+        {'subject_areas': subject_areas},
+    ).scalars().all()
+    department_ids.update(excluding_department_ids)
+    params = {
+        'department_ids': list(department_ids),
+        'start_term_id': None if None in start_term_ids else min(start_term_ids),
+        'end_term_id': None if None in end_term_ids else max(end_term_ids),
+    }
+    in_terms = """(CAST(:start_term_id AS VARCHAR) IS NULL OR term_id >= :start_term_id)
+        AND (CAST(:end_term_id AS VARCHAR) IS NULL OR term_id <= :end_term_id)"""
+    refreshed = connection.execute(
+        text(f'SELECT term_id, department_id FROM department_section_refreshes WHERE department_id = ANY(:department_ids) AND {in_terms}'),
+        params,
+    ).all()
+    inspect(listing).session.info.setdefault('department_section_refreshes', set()).update((r.term_id, r.department_id) for r in refreshed)
+    cached = connection.execute(
+        text(f'SELECT DISTINCT term_id, department_id, course_number FROM json_cache WHERE department_id = ANY(:department_ids) AND {in_terms}'),
+        params,
+    ).all()
+    for term_id, department_id, course_number in cached:
+        if course_number:
+            clear_department_section_cache(department_id, term_id, course_number)
+        else:
+            clear_department_cache(department_id, term_id)
+    ToolSetting.bump_version('REFERENCE_DATA_VERSION', connection=connection)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _refresh_department_sections(session, flush_context):
+    # Membership is refreshed in the transaction that changed the listings, so that reads of materialized terms never fall back
+    # to matching sections on the loch.
+    refreshes = session.info.pop('department_section_refreshes', None)
+    if not refreshes:
+        return
+    from damien.models.department import Department
+    for term_id, department_id in sorted(refreshes):
+        department = session.get(Department, department_id)
+        if department:
+            session.expire(department, ['catalog_listings'])
+            department.refresh_sections(term_id)
+
+
+class CatalogListingMatcher:
+    """Match sections to catalog listings using listings indexed by subject area and precompiled catalog id patterns.
+
+    A matcher is built once per set of listings and shared across sections.
+    """
+
+    def __init__(self, catalog_listings):
+        self.listings_by_subject_area = {}
+        for index, listing in enumerate(catalog_listings):
+            if listing.subject_area not in self.listings_by_subject_area:
+                self.listings_by_subject_area[listing.subject_area] = []
+            self.listings_by_subject_area[listing.subject_area].append((index, listing))
+        self.candidates_by_subject_area = {}
+        self.patterns = {}
+
+    def find(self, subject_area, catalog_id):
+        wildcard_match = None
+        for listing in self._candidates(subject_area):
+            if listing.catalog_id is None:
+                wildcard_match = wildcard_match or listing
+            # Exact matches on catalog id take precedence.
+            elif self._pattern(listing.catalog_id).match(catalog_id):
+                return listing
+        # Otherwise return any match on subject area.
+        return wildcard_match
+
+    def _candidates(self, subject_area):
+        # Listings with a blank subject area apply to all subject areas; original ordering is preserved.
+        if subject_area not in self.candidates_by_subject_area:
+            indexed_listings = self.listings_by_subject_area.get(subject_area, [])
+            if subject_area != '':
+                indexed_listings = sorted(indexed_listings + self.listings_by_subject_area.get('', []), key=lambda i: i[0])
+            self.candidates_by_subject_area[subject_area] = [listing for index, listing in indexed_listings]
+        return self.candidates_by_subject_area[subject_area]
+
+    def _pattern(self, catalog_id):
+        if catalog_id not in self.patterns:
+            self.patterns[catalog_id] = re.compile(f'^{catalog_id}$')
+        return self.patterns[catalog_id]
@@ -24,9 +24,11 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from damien import db, std_commit
+from damien.lib.cache import clear_dependent_caches
 from damien.lib.util import isoformat, utc_now
 from damien.models.base import Base
 from damien.models.department_catalog_listing import DepartmentCatalogListing
+from damien.models.tool_setting import ToolSetting
 
 
 class DepartmentForm(Base):
@@ -70,6 +72,7 @@ class DepartmentForm(Base):
         else:
             department_form = cls(name=name)
         db.session.add(department_form)
+        ToolSetting.bump_version('REFERENCE_DATA_VERSION')
         std_commit()
         return department_form
 
@@ -80,6 +83,8 @@ class DepartmentForm(Base):
         if department_form:
             department_form.deleted_at = now
             db.session.add(department_form)
+            ToolSetting.bump_version('REFERENCE_DATA_VERSION')
+            clear_dependent_caches('department_form', department_form.id)
             std_commit()
             return department_form
         else:
@@ -53,6 +53,7 @@ def clear():
 
 def load():
     _load_schemas()
+    _refresh_department_sections()
     _create_users()
     return db
 
@@ -72,6 +73,13 @@ def _load_schemas():
             _execute(ddlfile)
 
 
+def _refresh_department_sections():
+    from damien.models.department import Department
+    for term_id in db.session().execute(text('SELECT DISTINCT term_id FROM unholy_loch.sis_sections ORDER BY term_id')).scalars().all():
+        Department.refresh_all_sections(term_id)
+    std_commit(allow_test_environment=True)
+
+
 def _execute(ddlfile):
     # Let's leave the preprended copyright and license text out of this.
     sql = re.sub(r'^/\*.*?\*/\s*', '', ddlfile.read(), flags=re.DOTALL)
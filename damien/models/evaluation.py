@@ -28,13 +28,15 @@ from datetime import date, timedelta
 from itertools import groupby
 
 from damien import db, std_commit
+from damien.lib.berkeley import get_meeting_dates
 from damien.lib.cache import clear_department_cache, clear_section_cache
-from damien.lib.queries import get_default_meeting_dates, refresh_additional_instructors
-from damien.lib.util import isoformat, safe_strftime
+from damien.lib.queries import refresh_additional_instructors
+from damien.lib.reference_data import get_department_form_by_name
+from damien.lib.util import isoformat, safe_strftime, utc_now
 from damien.models.base import Base
 from damien.models.department_form import DepartmentForm
 from damien.models.evaluation_type import EvaluationType
-from flask import current_app as app
+from flask import current_app as app, g
 from flask_login import current_user
 from sqlalchemy import and_, func, orm, text, update
 from sqlalchemy.dialects.postgresql import ENUM
@@ -60,7 +62,24 @@ derived from the course number plus variable attributes.
 EvaluationExportKey = namedtuple('EvaluationExportKey', ['course_number', 'department_form', 'evaluation_type', 'start_date', 'end_date'])
 
 
-class Evaluation(Base):
+class EvaluationMixin:
+    """Identity and form helpers shared by saved and transient evaluations."""
+
+    __slots__ = ()
+
+    def get_id(self):
+        return self.id or self.transient_id()
+
+    def is_midterm(self):
+        return True if self.department_form and self.department_form.name.endswith('_MID') else False
+
+    # Fallback id string for evaluations that are created for the department/section API but not saved to the database, as
+    # parsed by _parse_transient_id.
+    def transient_id(self):
+        return f'_{self.term_id}_{self.course_number}_{self.instructor_uid}'
+
+
+class Evaluation(Base, EvaluationMixin):
     __tablename__ = 'evaluations'
 
     id = db.Column(db.Integer, nullable=False, primary_key=True, autoincrement=True)  # noqa: A003
@@ -122,8 +141,6 @@ class Evaluation(Base):
             'evaluationType': [],
             'evaluationPeriod': [],
         }
-        self.meeting_start_date = None
-        self.meeting_end_date = None
 
     def __repr__(self):
         return f"""<Evaluation id={self.id},
@@ -430,47 +447,6 @@ class Evaluation(Base):
         ]
         return db.session.query(func.max(cls.updated_at)).where(and_(*filters)).scalar()
 
-    @classmethod
-    def merge_transient(
-        cls,
-        uid,
-        loch_rows,
-        saved_evaluation=None,
-        foreign_dept_evaluations=(),
-        instructor=None,
-        default_form=None,
-        default_evaluation_types=None,
-    ):
-        transient_evaluation = cls(
-            term_id=loch_rows[0].term_id,
-            course_number=loch_rows[0].course_number,
-            instructor_uid=uid,
-        )
-        transient_evaluation.set_status(saved_evaluation, foreign_dept_evaluations)
-
-        if saved_evaluation and saved_evaluation.department_id:
-            transient_evaluation.department_id = saved_evaluation.department_id
-        else:
-            transient_evaluation.department_id = None
-
-        related_evaluations = foreign_dept_evaluations
-        if saved_evaluation and transient_evaluation.status in ['marked', 'confirmed']:
-            related_evaluations = related_evaluations + cls.get_duplicates(saved_evaluation, default_form)
-
-        transient_evaluation.set_department_form(saved_evaluation, related_evaluations, default_form)
-        transient_evaluation.set_evaluation_type(saved_evaluation, related_evaluations, instructor, default_evaluation_types)
-        transient_evaluation.set_dates(loch_rows, related_evaluations, saved_evaluation)
-        transient_evaluation.set_last_updated(loch_rows, saved_evaluation)
-        transient_evaluation.update_validity(saved_evaluation, related_evaluations)
-
-        if saved_evaluation:
-            transient_evaluation.id = saved_evaluation.id
-            # Underscore hack needed because setting the "department" relationship on a transient evaluation results
-            # in an attempted save and a primary-key conflict.
-            transient_evaluation._department = saved_evaluation.department
-
-        return transient_evaluation
-
     @classmethod
     def update_bulk(cls, department_id, evaluation_ids, fields, evaluations_feed=None):
         evaluations = []
@@ -509,6 +485,163 @@ class Evaluation(Base):
             end_date=self.end_date,
         )
 
+    def is_transient(self):
+        return self.id is None
+
+    def is_visible(self):
+        return self.status != 'deleted'
+
+    def set_fields(self, fields, original_evaluation_feed=None):
+        if 'midterm' in fields:
+            self.set_midterm_form(original_evaluation_feed)
+        elif 'departmentForm' in fields:
+            self.department_form = fields['departmentForm']
+        if 'startDate' in fields:
+            self.start_date = fields['startDate']
+        if 'evaluationType' in fields:
+            self.evaluation_type = fields['evaluationType']
+        if 'instructorUid' in fields:
+            self.instructor_uid = fields['instructorUid']
+            refresh_additional_instructors([self.instructor_uid])
+        if 'status' in fields:
+            self.status = fields['status']
+            if fields['status'] in ('marked', 'confirmed', None):
+                self.__class__.update_evaluation_status(self.term_id, self.course_number, self.instructor_uid, fields['status'])
+        if original_evaluation_feed:
+            _set_defaults(self, original_evaluation_feed)
+
+    def set_midterm_form(self, original_evaluation_feed):
+        if original_evaluation_feed and original_evaluation_feed.get('departmentForm'):
+            midterm_form = get_department_form_by_name(original_evaluation_feed['departmentForm']['name'] + '_MID')
+            if midterm_form:
+                # Cached department forms are detached, and must be merged into the session before assignment.
+                self.department_form = db.session.merge(midterm_form, load=False)
+
+    @classmethod
+    def flush_validity_updates(cls, commit=True):
+        """Write buffered validity changes with a single UPDATE, then invalidate affected caches.
+
+        Callers that write regenerated section caches afterward keep them, as the write is under a later cache epoch.
+        """
+        updates = g.pop('evaluation_validity_updates', None)
+        if not updates:
+            return
+        params = {'updated_at': utc_now()}
+        values = []
+        for index, (evaluation_id, validity_update) in enumerate(updates.items()):
+            params.update({f'id_{index}': evaluation_id, f'valid_{index}': validity_update['valid']})
+            values.append(f'(CAST(:id_{index} AS INTEGER), CAST(:valid_{index} AS BOOLEAN))')
+        query = text(f"""UPDATE evaluations e
+            SET valid = v.valid, updated_at = :updated_at
+            FROM (VALUES {', '.join(values)}) AS v(id, valid)
+            WHERE e.id = v.id""")
+        result = db.session.execute(query, params)
+        app.logger.info(f'Validity update for {len(updates)} evaluations affected {result.rowcount} rows')
+
+        for validity_update in updates.values():
+            if validity_update['department_id']:
+                clear_department_cache(validity_update['department_id'], validity_update['term_id'])
+            clear_section_cache(validity_update['term_id'], validity_update['course_number'])
+        if commit:
+            std_commit()
+
+
+class TransientEvaluation(EvaluationMixin):
+    """Evaluation merged from loch rows and saved evaluations for the department/section API and exports.
+
+    Merged evaluations are plain slotted objects rather than mapped Evaluation instances, so that merging many thousands of
+    rows skips ORM instrumentation and never risks an autoflush. Saved evaluations are only written through the ORM on real edits.
+    """
+
+    __slots__ = (
+        'conflicts',
+        'course_number',
+        'department',
+        'department_form',
+        'department_id',
+        'end_date',
+        'evaluation_type',
+        'id',
+        'instructor_uid',
+        'last_updated',
+        'meeting_end_date',
+        'meeting_start_date',
+        'start_date',
+        'status',
+        'term_id',
+        'valid',
+    )
+
+    def __init__(self, term_id, course_number, instructor_uid=None):
+        self.term_id = term_id
+        self.course_number = course_number
+        self.instructor_uid = instructor_uid if instructor_uid != 'None' else None
+        self.id = None
+        self.department = None
+        self.department_id = None
+        self.department_form = None
+        self.evaluation_type = None
+        self.status = None
+        self.start_date = None
+        self.end_date = None
+        self.meeting_start_date = None
+        self.meeting_end_date = None
+        self.last_updated = None
+        self.valid = True
+        self.conflicts = {
+            'departmentForm': [],
+            'evaluationType': [],
+            'evaluationPeriod': [],
+        }
+
+    def __repr__(self):
+        return f"""<TransientEvaluation id={self.get_id()},
+                    department_id={self.department_id},
+                    status={self.status},
+                    start_date={self.start_date},
+                    end_date={self.end_date},
+                    valid={self.valid}>
+                """
+
+    @classmethod
+    def merge(
+        cls,
+        uid,
+        loch_rows,
+        saved_evaluation=None,
+        foreign_dept_evaluations=(),
+        instructor=None,
+        default_form=None,
+        default_evaluation_types=None,
+        duplicate_resolver=None,
+    ):
+        transient_evaluation = cls(
+            term_id=loch_rows[0].term_id,
+            course_number=loch_rows[0].course_number,
+            instructor_uid=uid,
+        )
+        transient_evaluation.set_status(saved_evaluation, foreign_dept_evaluations)
+
+        if saved_evaluation and saved_evaluation.department_id:
+            transient_evaluation.department_id = saved_evaluation.department_id
+
+        related_evaluations = foreign_dept_evaluations
+        if saved_evaluation and transient_evaluation.status in ['marked', 'confirmed']:
+            get_duplicates = duplicate_resolver.get_duplicates if duplicate_resolver else Evaluation.get_duplicates
+            related_evaluations = related_evaluations + get_duplicates(saved_evaluation, default_form)
+
+        transient_evaluation.set_department_form(saved_evaluation, related_evaluations, default_form)
+        transient_evaluation.set_evaluation_type(saved_evaluation, related_evaluations, instructor, default_evaluation_types)
+        transient_evaluation.set_dates(loch_rows, related_evaluations, saved_evaluation)
+        transient_evaluation.set_last_updated(loch_rows, saved_evaluation)
+        transient_evaluation.update_validity(saved_evaluation, related_evaluations)
+
+        if saved_evaluation:
+            transient_evaluation.id = saved_evaluation.id
+            transient_evaluation.department = saved_evaluation.department
+
+        return transient_evaluation
+
     def get_default_evaluation_dates(self, default_meeting_dates):
         end_date = self.meeting_end_date or default_meeting_dates['end_date']
         # The most common meeting end date is the Friday before finals week. During Spring and Fall terms, we bump these two days forward
@@ -521,15 +654,6 @@ class Evaluation(Base):
             start_date = end_date - timedelta(days=20)
         return (start_date, end_date)
 
-    def get_id(self):
-        return self.id or self.transient_id()
-
-    def is_midterm(self):
-        return True if self.department_form and self.department_form.name.endswith('_MID') else False
-
-    def is_transient(self):
-        return self.id is None
-
     def is_valid(self, foreign_department_evaluation=None):
         if self.status in ('marked', 'confirmed'):
             if next((v for v in (foreign_department_evaluation or self).conflicts.values() if len(v)), None):
@@ -542,9 +666,6 @@ class Evaluation(Base):
                 return False
         return True
 
-    def is_visible(self):
-        return self.status != 'deleted'
-
     def mark_conflict(self, other_evaluation, key, saved_evaluation, self_value, other_value):
         if other_evaluation.status != 'ignore':
             self.conflicts[key].append({'department': other_evaluation.department.dept_name, 'value': other_value})
@@ -556,7 +677,7 @@ class Evaluation(Base):
     def set_dates(self, loch_rows, foreign_dept_evaluations, saved_evaluation):
         self.meeting_start_date = min((r['meeting_start_date'] for r in loch_rows if r['meeting_start_date']), default=None)
         self.meeting_end_date = max((r['meeting_end_date'] for r in loch_rows if r['meeting_end_date']), default=None)
-        default_meeting_dates = get_default_meeting_dates(term_ids=[self.term_id])[0]
+        default_meeting_dates = get_meeting_dates([self.term_id])[self.term_id]['default']
         if not self.meeting_start_date:
             self.meeting_start_date = default_meeting_dates['start_date']
         if not self.meeting_end_date:
@@ -632,37 +753,12 @@ class Evaluation(Base):
             elif instructor and 'ACADEMIC' in instructor.get('affiliations', []):
                 self.evaluation_type = default_evaluation_types.get('F')
 
-    def set_fields(self, fields, original_evaluation_feed=None):
-        if 'midterm' in fields:
-            self.set_midterm_form(original_evaluation_feed)
-        elif 'departmentForm' in fields:
-            self.department_form = fields['departmentForm']
-        if 'startDate' in fields:
-            self.start_date = fields['startDate']
-        if 'evaluationType' in fields:
-            self.evaluation_type = fields['evaluationType']
-        if 'instructorUid' in fields:
-            self.instructor_uid = fields['instructorUid']
-            refresh_additional_instructors([self.instructor_uid])
-        if 'status' in fields:
-            self.status = fields['status']
-            if fields['status'] in ('marked', 'confirmed', None):
-                self.__class__.update_evaluation_status(self.term_id, self.course_number, self.instructor_uid, fields['status'])
-        if original_evaluation_feed:
-            _set_defaults(self, original_evaluation_feed)
-
     def set_last_updated(self, loch_rows, saved_evaluation):
         updates = [r['created_at'] for r in loch_rows]
         if saved_evaluation:
             updates.append(saved_evaluation.updated_at)
         self.last_updated = max(updates)
 
-    def set_midterm_form(self, original_evaluation_feed):
-        if original_evaluation_feed and original_evaluation_feed.get('departmentForm'):
-            midterm_form = DepartmentForm.find_by_name(original_evaluation_feed['departmentForm']['name'] + '_MID')
-            if midterm_form:
-                self.department_form = midterm_form
-
     def set_status(self, saved_evaluation, foreign_dept_evaluations):
         if saved_evaluation and saved_evaluation.status:
             self.status = saved_evaluation.status
@@ -707,11 +803,10 @@ class Evaluation(Base):
             'conflicts': {},
             'valid': self.valid,
         })
-        dept = self.department or (hasattr(self, '_department') and self._department)
-        if dept:
+        if self.department:
             feed['department'] = {
-                'id': dept.id,
-                'name': dept.dept_name,
+                'id': self.department.id,
+                'name': self.department.dept_name,
             }
         for field, conflicts in self.conflicts.items():
             if conflicts:
@@ -727,31 +822,69 @@ class Evaluation(Base):
             end_date=self.end_date,
         )
 
-    # Fallback id string for Evaluation instances that are created for the department/section API but not saved to the database.
-    def transient_id(self):
-        return f'_{self.term_id}_{self.course_number}_{self.instructor_uid}'
-
     def update_validity(self, saved_evaluation, foreign_dept_evaluations):
         self.valid = True
-        updated = False
         if saved_evaluation:
             updated_validity = self.is_valid()
             if updated_validity != saved_evaluation.valid:
-                saved_evaluation.valid = updated_validity
-                db.session.add(saved_evaluation)
-                updated = True
-                clear_department_cache(self.department_id, self.term_id)
+                self._buffer_validity_update(saved_evaluation, updated_validity)
             self.valid = saved_evaluation.valid
         for fde in foreign_dept_evaluations:
             updated_validity = self.is_valid(fde)
             if updated_validity != fde.valid:
-                fde.valid = updated_validity
-                db.session.add(fde)
-                updated = True
-                clear_department_cache(fde.department_id, self.term_id)
-        if updated:
-            clear_section_cache(self.term_id, self.course_number)
-            std_commit()
+                self._buffer_validity_update(fde, updated_validity)
+
+    def _buffer_validity_update(self, evaluation, valid):
+        # Validity changes found during feed generation are written back in bulk by flush_validity_updates. Setting the
+        # committed value keeps the loaded evaluation current without marking it dirty in the session.
+        orm.attributes.set_committed_value(evaluation, 'valid', valid)
+        if 'evaluation_validity_updates' not in g:
+            g.evaluation_validity_updates = {}
+        g.evaluation_validity_updates[evaluation.id] = {
+            'valid': valid,
+            'department_id': evaluation.department_id,
+            'term_id': self.term_id,
+            'course_number': self.course_number,
+        }
+
+
+class DuplicateResolver:
+    """Resolve duplicate evaluations in memory from rows already loaded for a department feed.
+
+    Evaluations are indexed by (course_number, department_id, instructor_uid), so that merging a section need not run one
+    get_duplicates query per saved evaluation. Matching rules follow Evaluation.get_duplicates.
+    """
+
+    def __init__(self, evaluations):
+        self.evaluations_by_key = {}
+        for e in evaluations:
+            if e.instructor_uid and e.status in ('confirmed', 'marked'):
+                key = (e.course_number, e.department_id, e.instructor_uid)
+                if key not in self.evaluations_by_key:
+                    self.evaluations_by_key[key] = []
+                self.evaluations_by_key[key].append(e)
+
+    def get_duplicates(self, evaluation, default_form):
+        department_form = evaluation.department_form or default_form
+        if not department_form:
+            return []
+        candidates = self.evaluations_by_key.get((evaluation.course_number, evaluation.department_id, evaluation.instructor_uid), [])
+        return [
+            e for e in candidates
+            if e.id != evaluation.id
+            and e.department_form
+            and e.department_form.name != f'{department_form.name}_MID'
+            and f'{e.department_form.name}_MID' != department_form.name
+        ]
+
+
+def flush_validity_updates_on_teardown(exception=None):
+    # Validity changes buffered by a feed that was abandoned or failed before flushing are written when the app context ends,
+    # unless it ended in error.
+    if exception:
+        g.pop('evaluation_validity_updates', None)
+    elif g.get('evaluation_validity_updates'):
+        Evaluation.flush_validity_updates()
 
 
 def is_modular(start_date, end_date):
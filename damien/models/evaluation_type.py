@@ -26,6 +26,7 @@ ENHANCEMENTS, OR MODIFICATIONS.
 from damien import db, std_commit
 from damien.lib.util import isoformat, utc_now
 from damien.models.base import Base
+from damien.models.tool_setting import ToolSetting
 
 
 class EvaluationType(Base):
@@ -57,6 +58,7 @@ class EvaluationType(Base):
         else:
             evaluation_type = cls(name=name)
         db.session.add(evaluation_type)
+        ToolSetting.bump_version('REFERENCE_DATA_VERSION')
         std_commit()
         return evaluation_type
 
@@ -67,6 +69,7 @@ class EvaluationType(Base):
         if evaluation_type:
             evaluation_type.deleted_at = now
             db.session.add(evaluation_type)
+            ToolSetting.bump_version('REFERENCE_DATA_VERSION')
             std_commit()
             return evaluation_type
         else:
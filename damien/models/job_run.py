@@ -0,0 +1,141 @@
+"""
+Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from damien import db, std_commit
+from damien.lib.util import isoformat, utc_now
+from damien.models.base import Base
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
+from sqlalchemy.orm import Session
+
+
+job_run_status_enum = ENUM(
+    'started',
+    'success',
+    'error',
+    name='job_run_status',
+    create_type=False,
+)
+
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, nullable=False, primary_key=True)  # noqa: A003
+    job_key = db.Column(db.String(80), nullable=False)
+    status = db.Column(job_run_status_enum, nullable=False)
+    term_id = db.Column(db.String(4))
+    phase = db.Column(db.String(80))
+    progress = db.Column(JSONB, nullable=False, default=list)
+    error = db.Column(db.Text)
+    finished_at = db.Column(db.DateTime)
+
+    def __init__(
+        self,
+        job_key,
+        status,
+    ):
+        self.job_key = job_key
+        self.status = status
+        self.progress = []
+
+    def __repr__(self):
+        return f"""<JobRun id={self.id},
+                    job_key={self.job_key},
+                    status={self.status},
+                    term_id={self.term_id},
+                    phase={self.phase},
+                    created_at={self.created_at},
+                    finished_at={self.finished_at}>
+                """
+
+    @classmethod
+    def start(cls, job_key):
+        def _start(session):
+            run = cls(job_key=job_key, status='started')
+            session.add(run)
+            session.flush()
+            return run.id
+        return cls._write(_start)
+
+    @classmethod
+    def start_phase(cls, run_id, phase, term_id=None):
+        def _start_phase(session):
+            run = session.get(cls, run_id)
+            run.phase = phase
+            run.term_id = term_id
+            run.progress = run.progress + [{'phase': phase, 'termId': term_id, 'startedAt': isoformat(utc_now())}]
+        cls._write(_start_phase)
+
+    @classmethod
+    def update_phase(cls, run_id, rows=None, seconds=None, error=None):
+        def _update_phase(session):
+            run = session.get(cls, run_id)
+            if run.progress:
+                phase = {**run.progress[-1], 'rows': rows, 'error': error}
+                if seconds is not None:
+                    phase['seconds'] = round(seconds, 2)
+                run.progress = run.progress[:-1] + [phase]
+        cls._write(_update_phase)
+
+    @classmethod
+    def finish(cls, run_id, error=None):
+        def _finish(session):
+            run = session.get(cls, run_id)
+            run.status = 'error' if error else 'success'
+            run.phase = None
+            run.error = error
+            run.finished_at = utc_now()
+        cls._write(_finish)
+
+    @classmethod
+    def get_history(cls, job_key, limit=20):
+        return cls.query.filter_by(job_key=job_key).order_by(cls.created_at.desc(), cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def get_latest(cls, job_key):
+        return cls.query.filter_by(job_key=job_key).order_by(cls.created_at.desc(), cls.id.desc()).first()
+
+    @classmethod
+    def _write(cls, update):
+        # Progress is committed on its own connection, so that it is visible while the job's own transaction is still open.
+        with Session(db.engine) as session:
+            result = update(session)
+            std_commit(allow_test_environment=True, session=session)
+            return result
+
+    def to_api_json(self):
+        finished_at = self.finished_at or utc_now()
+        return {
+            'id': self.id,
+            'jobKey': self.job_key,
+            'status': self.status,
+            'termId': self.term_id,
+            'phase': self.phase,
+            'progress': self.progress,
+            'error': self.error,
+            'seconds': round((finished_at - self.created_at).total_seconds(), 2) if self.created_at else None,
+            'createdAt': isoformat(self.created_at),
+            'finishedAt': isoformat(self.finished_at),
+        }
@@ -23,11 +23,38 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import gzip
+
 from damien import db, std_commit
+from damien.lib import notifications
+from damien.lib.util import utc_now
 from damien.models.base import Base
 from flask import current_app as app
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.exc import IntegrityError
+import simplejson
+from sqlalchemy import case, event, func, literal, select, text
+from sqlalchemy.dialects.postgresql import BYTEA, insert, JSONB
+from sqlalchemy.orm import Session
+
+
+# Reference data and instructors that cached section feeds depend on, so that a change to one of them can clear only the
+# feeds that include it.
+json_cache_dependencies = db.Table(
+    'json_cache_dependencies',
+    db.Column('cache_id', db.Integer, db.ForeignKey('json_cache.id', ondelete='CASCADE'), nullable=False, primary_key=True),
+    db.Column('kind', db.String(32), nullable=False, primary_key=True),
+    db.Column('value', db.String(255), nullable=False, primary_key=True),
+)
+
+# Invalidation bumps the epoch of a scope within a term rather than deleting rows. A cache row records the epoch it was
+# written under and is ignored once any scope covering it has a later epoch; stale rows are overwritten on the next write
+# and reclaimed by sweep_stale. Scopes are '' (whole term), 'department:<id>' (department summary), 'section:<course_number>'
+# (the section in every department) and 'department:<id>:section:<course_number>'.
+json_cache_epochs = db.Table(
+    'json_cache_epochs',
+    db.Column('term_id', db.String(4), nullable=False, primary_key=True),
+    db.Column('scope', db.String(80), nullable=False, primary_key=True),
+    db.Column('epoch', db.BigInteger, nullable=False),
+)
 
 
 class JsonCache(Base):
@@ -38,6 +65,9 @@ class JsonCache(Base):
     department_id = db.Column(db.String, nullable=False)
     course_number = db.Column(db.String, nullable=False)
     json = db.Column(JSONB)
+    # Section feeds are stored here instead of in the json column when JSON_CACHE_FORMAT is 'gzip'.
+    payload = db.Column(BYTEA)
+    epoch = db.Column(db.BigInteger, nullable=False, default=0)
 
     def __init__(self, term_id, department_id, course_number, json=None):
         self.term_id = term_id
@@ -46,64 +76,255 @@ class JsonCache(Base):
         self.json = json
 
     def __repr__(self):
-        return f'<JsonCache {self.term_id}/{self.department_id}/{self.course_number}, json={self.json}>'
+        return f'<JsonCache {self.term_id}/{self.department_id}/{self.course_number}, epoch={self.epoch}, json={self.json}>'
+
+    @classmethod
+    def bump_epochs(cls, keys):
+        # Each key is (term_id, department_id, course_number); a null department_id matches the course in every department.
+        scopes = sorted({(term_id, _scope(department_id, course_number)) for term_id, department_id, course_number in keys})
+        if not scopes:
+            return
+        params = {}
+        values = []
+        for index, (term_id, scope) in enumerate(scopes):
+            params.update({f'term_id_{index}': term_id, f'scope_{index}': scope})
+            values.append(f'(CAST(:term_id_{index} AS VARCHAR), CAST(:scope_{index} AS VARCHAR))')
+        query = text(f"""INSERT INTO json_cache_epochs (term_id, scope, epoch)
+            SELECT s.term_id, s.scope, nextval('json_cache_epoch_seq')
+            FROM (VALUES {', '.join(values)}) AS s(term_id, scope)
+            ON CONFLICT (term_id, scope) DO UPDATE SET epoch = EXCLUDED.epoch""")
+        db.session.execute(query, params)
+        for term_id, department_id, course_number in keys:
+            _mark_changed(term_id, department_id, course_number)
 
     @classmethod
     def clear_department(cls, term_id, department_id):
-        cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=None).delete(synchronize_session=False)
+        cls.bump_epochs([(term_id, department_id, None)])
 
     @classmethod
     def clear_department_section(cls, term_id, department_id, course_number):
-        cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=course_number).delete(synchronize_session=False)
+        cls.bump_epochs([(term_id, department_id, course_number)])
 
     @classmethod
     def clear_section(cls, term_id, course_number):
-        cls.query.filter_by(term_id=term_id, course_number=course_number).delete(synchronize_session=False)
+        cls.bump_epochs([(term_id, None, course_number)])
 
     @classmethod
     def clear_term(cls, term_id):
-        cls.query.filter_by(term_id=term_id).delete(synchronize_session=False)
-
-    @classmethod
-    def delete_matching(cls, token):
-        cls.query.filter(cls.json[0].astext.like(f'%{token}%')).delete(synchronize_session=False)
+        cls.bump_epochs([(term_id, None, None)])
 
     @classmethod
     def fetch_all_departments(cls, term_id):
-        return cls.query.filter_by(term_id=term_id, course_number=None).all()
+        # Visible course numbers are kept for the evaluations feed and need not be loaded with every department summary. Stale
+        # summaries are included, flagged as not current, so that they can be served while being rebuilt.
+        summary_json = cls.json.op('-', return_type=JSONB)('visibleCourseNumbers').label('json')
+        query = cls.query.filter_by(term_id=term_id, course_number=None)
+        return query.with_entities(cls.department_id, summary_json, _is_current().label('is_current')).all()
 
     @classmethod
     def fetch_all_sections(cls, term_id, department_id):
-        return cls.query.filter(cls.term_id == term_id, cls.department_id == department_id, cls.course_number.isnot(None)).all()
+        return cls.query.filter(cls.term_id == term_id, cls.department_id == department_id, cls.course_number.isnot(None), _is_current()).all()
+
+    @classmethod
+    def fetch_dependent_keys(cls, kind, value):
+        # Keys of current section feeds that depend on the value, for invalidation by epoch.
+        query = cls.query.join(json_cache_dependencies, json_cache_dependencies.c.cache_id == cls.id).filter(
+            json_cache_dependencies.c.kind == kind,
+            json_cache_dependencies.c.value == str(value),
+            _is_current(),
+        )
+        return query.with_entities(cls.term_id, cls.department_id, cls.course_number).all()
 
     @classmethod
     def fetch_department(cls, term_id, department_id):
-        stowed = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=None).first()
+        stowed = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=None).filter(_is_current()).first()
         if stowed is not None:
             return stowed.json
 
+    @classmethod
+    def fetch_department_summary(cls, term_id, department_id):
+        # Unlike fetch_department, a stale summary is returned too, along with whether it is current.
+        query = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=None)
+        return query.with_entities(cls.json, _is_current().label('is_current')).first()
+
     @classmethod
     def fetch_section(cls, term_id, department_id, course_number):
-        stowed = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=course_number).first()
+        stowed = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=course_number).filter(_is_current()).first()
         if stowed is not None:
-            return stowed.json
+            return stowed.to_api_json()
+
+    @classmethod
+    def fetch_section_course_numbers(cls, term_id, department_id):
+        query = cls.query.filter(cls.term_id == term_id, cls.department_id == department_id, cls.course_number.isnot(None), _is_current())
+        return [r.course_number for r in query.with_entities(cls.course_number).all()]
+
+    @classmethod
+    def fetch_section_payload(cls, term_id, department_id, course_number):
+        # Compressed bytes are returned as stored, for callers able to send them on without decoding.
+        query = cls.query.filter_by(term_id=term_id, department_id=department_id, course_number=course_number).filter(_is_current())
+        stowed = query.with_entities(cls.payload).first()
+        if stowed is not None:
+            return stowed.payload
+
+    @classmethod
+    def fetch_sections(cls, term_id, department_id, course_numbers):
+        query = cls.query.filter(cls.term_id == term_id, cls.department_id == department_id, cls.course_number.in_(course_numbers))
+        return query.filter(_is_current()).all()
+
+    @classmethod
+    def get_generation(cls, term_id, department_id=None):
+        # Generation of the department's cached feeds, or of all department summaries if no department is given, counted from
+        # the notifications covering them so that no query is needed. None while the worker is not listening for notifications,
+        # or while the session holds uncommitted cache changes, since what it reads is not yet shared.
+        if db.session().info.get('json_cache_changed'):
+            return None
+        if department_id is None:
+            arguments = [term_id, f'{term_id}:summaries']
+        else:
+            arguments = [term_id, f'{term_id}:sections', f'{term_id}:{department_id}']
+        generations = [notifications.generation(f'json_cache:{argument}') for argument in arguments]
+        return None if None in generations else tuple(generations)
 
     @classmethod
     def set_department(cls, term_id, department_id, json):
-        row = cls(term_id=term_id, department_id=department_id, course_number=None, json=json)
-        try:
-            db.session.add(row)
+        # Department summaries have a null course number, so conflicts are caught by a partial index on term and department.
+        _mark_changed(term_id, department_id)
+        now = utc_now()
+        statement = insert(cls.__table__).values(
+            term_id=term_id,
+            department_id=department_id,
+            course_number=None,
+            json=json,
+            epoch=_next_epoch(),
+            created_at=now,
+            updated_at=now,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['term_id', 'department_id'],
+            index_where=cls.__table__.c.course_number.is_(None),
+            set_={'json': statement.excluded.json, 'epoch': statement.excluded.epoch, 'updated_at': statement.excluded.updated_at},
+        )
+        db.session.execute(statement)
+        std_commit()
+
+    @classmethod
+    def set_sections(cls, term_id, department_id, sections, chunk_size=500, commit=True):
+        # One multi-row upsert per chunk of {course_number: json}, committed once at the end unless the caller commits later.
+        rows = [{'course_number': course_number, **_encode(feed)} for course_number, feed in sections.items()]
+        if sections:
+            _mark_changed(term_id, department_id, next(iter(sections)))
+        epoch = _next_epoch()
+        now = utc_now()
+        for i in range(0, len(rows), chunk_size):
+            values = [
+                {'term_id': term_id, 'department_id': department_id, 'epoch': epoch, 'created_at': now, 'updated_at': now, **row}
+                for row in rows[i:i + chunk_size]
+            ]
+            statement = insert(cls.__table__).values(values)
+            statement = statement.on_conflict_do_update(
+                index_elements=['term_id', 'department_id', 'course_number'],
+                set_={
+                    'json': statement.excluded.json,
+                    'payload': statement.excluded.payload,
+                    'epoch': statement.excluded.epoch,
+                    'updated_at': statement.excluded.updated_at,
+                },
+            ).returning(cls.__table__.c.id, cls.__table__.c.course_number)
+            cache_ids = {r.course_number: r.id for r in db.session.execute(statement)}
+            _set_dependencies({cache_ids[course_number]: sections[course_number] for course_number in cache_ids})
+        if commit:
             std_commit()
-        except IntegrityError:
-            app.logger.warn(f'Conflict for department cache {term_id}/{department_id}; will attempt to return stowed JSON')
-            return cls.fetch_department(term_id, department_id)
 
     @classmethod
     def set_section(cls, term_id, department_id, course_number, json):
-        row = cls(term_id=term_id, department_id=department_id, course_number=course_number, json=json)
-        try:
-            db.session.add(row)
-            std_commit()
-        except IntegrityError:
-            app.logger.warn(f'Conflict for section cache {term_id}/{department_id}/{course_number}; will attempt to return stowed JSON')
-            return cls.fetch_section(term_id, department_id, course_number)
+        cls.set_sections(term_id, department_id, {course_number: json})
+
+    @classmethod
+    def sweep_stale(cls):
+        result = cls.query.filter(~_is_current()).delete(synchronize_session=False)
+        app.logger.info(f'Swept {result} stale cache rows')
+        return result
+
+    def to_api_json(self):
+        if self.payload is None:
+            return self.json
+        return simplejson.loads(gzip.decompress(self.payload))
+
+
+_REFERENCE_DEPENDENCY_KEYS = {
+    'defaultDepartmentForm': 'department_form',
+    'departmentForm': 'department_form',
+    'evaluationType': 'evaluation_type',
+}
+
+
+def _set_dependencies(feeds_by_cache_id):
+    db.session.execute(json_cache_dependencies.delete().where(json_cache_dependencies.c.cache_id.in_(list(feeds_by_cache_id.keys()))))
+    rows = []
+    for cache_id, feed in feeds_by_cache_id.items():
+        dependencies = set()
+        for evaluation in feed:
+            for key, kind in _REFERENCE_DEPENDENCY_KEYS.items():
+                if evaluation.get(key):
+                    dependencies.add((kind, str(evaluation[key]['id'])))
+            if (evaluation.get('instructor') or {}).get('uid'):
+                dependencies.add(('instructor', evaluation['instructor']['uid']))
+        rows.extend({'cache_id': cache_id, 'kind': kind, 'value': value} for kind, value in dependencies)
+    if rows:
+        db.session.execute(json_cache_dependencies.insert(), rows)
+
+
+def _encode(feed):
+    if app.config['JSON_CACHE_FORMAT'] == 'gzip':
+        return {'json': None, 'payload': gzip.compress(simplejson.dumps(feed, ignore_nan=True, separators=(',', ':')).encode())}
+    return {'json': feed, 'payload': None}
+
+
+def _is_current():
+    # A row is current unless the term, or the department summary or section it holds, has been invalidated since it was written.
+    department_scope = literal('department:') + JsonCache.department_id
+    scopes = [
+        '',
+        case((JsonCache.course_number.is_(None), department_scope), else_=literal('section:') + JsonCache.course_number),
+        department_scope + literal(':section:') + JsonCache.course_number,
+    ]
+    latest_epoch = select(func.max(json_cache_epochs.c.epoch)).where(
+        json_cache_epochs.c.term_id == JsonCache.term_id,
+        json_cache_epochs.c.scope.in_(scopes),
+    ).scalar_subquery()
+    return JsonCache.epoch >= func.coalesce(latest_epoch, 0)
+
+
+def _mark_changed(term_id, department_id=None, course_number=None):
+    # Notifications name the scope changed: '<term_id>' for the whole term, '<term_id>:sections' for a course in every
+    # department, '<term_id>:<department_id>' for the feeds and summary of a department, plus '<term_id>:summaries' whenever a
+    # department summary may have changed.
+    if department_id:
+        arguments = [f'{term_id}:{department_id}'] if course_number else [f'{term_id}:{department_id}', f'{term_id}:summaries']
+    else:
+        arguments = [f'{term_id}:sections'] if course_number else [term_id]
+    changed = db.session().info.setdefault('json_cache_changed', set())
+    for argument in arguments:
+        if argument not in changed:
+            notifications.publish('json_cache', argument)
+            changed.add(argument)
+
+
+def _next_epoch():
+    return db.session.execute(text("SELECT nextval('json_cache_epoch_seq')")).scalar()
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes_after_transaction(session):
+    session.info.pop('json_cache_changed', None)
+
+
+def _scope(department_id, course_number):
+    if department_id and course_number:
+        return f'department:{department_id}:section:{course_number}'
+    elif department_id:
+        return f'department:{department_id}'
+    elif course_number:
+        return f'section:{course_number}'
+    return ''
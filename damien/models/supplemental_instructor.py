@@ -26,8 +26,10 @@ ENHANCEMENTS, OR MODIFICATIONS.
 import re
 
 from damien import db, std_commit
+from damien.lib.cache import clear_dependent_caches
 from damien.lib.util import isoformat, utc_now
 from damien.models.base import Base
+from damien.models.tool_setting import ToolSetting
 from sqlalchemy import and_, or_
 
 
@@ -89,6 +91,8 @@ class SupplementalInstructor(Base):
                 email_address=email_address,
             )
         db.session.add(instructor)
+        ToolSetting.bump_version('INSTRUCTOR_DIRECTORY_VERSION')
+        clear_dependent_caches('instructor', ldap_uid)
         std_commit()
         return instructor
 
@@ -99,21 +103,22 @@ class SupplementalInstructor(Base):
         if instructor:
             instructor.deleted_at = now
             db.session.add(instructor)
+            ToolSetting.bump_version('INSTRUCTOR_DIRECTORY_VERSION')
+            clear_dependent_caches('instructor', ldap_uid)
             std_commit()
             return instructor
         else:
             return None
 
+    @classmethod
+    def find_all(cls):
+        return cls.query.filter_by(deleted_at=None).all()
+
     @classmethod
     def find_by_uid(cls, ldap_uid):
         query = cls.query.filter_by(ldap_uid=ldap_uid, deleted_at=None)
         return query.first()
 
-    @classmethod
-    def find_by_uids(cls, ldap_uids):
-        query = cls.query.filter(and_(cls.ldap_uid.in_(ldap_uids), cls.deleted_at == None))  # noqa: E711
-        return query.all()
-
     @classmethod
     def search(cls, snippet):
         words = list(set(snippet.upper().split()))
@@ -82,6 +82,8 @@ class SupplementalSection(Base):
             section.deleted_at = now
             db.session.add(section)
             std_commit()
+            clear_section_cache(section.term_id, section.course_number)
+            clear_department_cache(section.department_id, section.term_id)
             return section
         else:
             return None
@@ -23,9 +23,13 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import uuid
+
 from damien import db, std_commit
-from damien.lib.util import camelize, to_bool_or_none
+from damien.lib import notifications
+from damien.lib.util import camelize, to_bool_or_none, utc_now
 from damien.models.base import Base
+from sqlalchemy import text
 
 
 class ToolSetting(Base):
@@ -52,6 +56,27 @@ class ToolSetting(Base):
         setting = cls.get_tool_setting(key)
         return False if setting is None else to_bool_or_none(setting)
 
+    @classmethod
+    def bump_version(cls, key, connection=None):
+        """Store a new version id under the key, so that in-process caches of the versioned data know to reload it."""
+        version = str(uuid.uuid4())
+        now = utc_now()
+        query = text("""INSERT INTO tool_settings (key, value, created_at, updated_at)
+            VALUES (:key, :value, :now, :now)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at""")
+        (connection or db.session).execute(query, {'key': key, 'value': version, 'now': now})
+        notifications.publish('tool_setting', key, connection=connection)
+        db.session().info.setdefault('tool_setting_versions', {})[key] = version
+        return version
+
+    @classmethod
+    def get_version(cls, key):
+        # A version is read at most once per database session, which lasts a single request, unless bumped in the meantime.
+        versions = db.session().info.setdefault('tool_setting_versions', {})
+        if key not in versions:
+            versions[key] = cls.get_tool_setting(key)
+        return versions[key]
+
     @classmethod
     def upsert(cls, key, value):
         tool_setting = cls.query.filter_by(key=key).first()
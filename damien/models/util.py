@@ -27,6 +27,8 @@ from contextlib import contextmanager
 
 from damien import db
 from flask import current_app as app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 
 
 def select_column(sql):
@@ -84,5 +86,32 @@ def advisory_unlock(connection, lock_id):
         unlocked = next(result).unlocked
 
 
+@contextmanager
+def advisory_key_lock(lock_id, key, timeout_seconds):
+    # Two-key lock on (lock_id, hashtext(key)), held at session level on a pooled connection of its own so that commits in the
+    # yield block do not release it. The connection goes back to the pool only once the lock is released. Yields True if the
+    # lock was granted at once, False if it was granted after waiting for another holder to release it, and None if the wait
+    # timed out.
+    params = {'lock_id': lock_id, 'key': key}
+    with db.engine.execution_options(isolation_level='AUTOCOMMIT').connect() as lock_connection:
+        granted = lock_connection.execute(text('SELECT pg_try_advisory_lock(:lock_id, hashtext(:key))'), params).scalar()
+        if not granted:
+            try:
+                lock_connection.execute(text(f"SET lock_timeout = '{int(timeout_seconds * 1000)}ms'"))
+                lock_connection.execute(text('SELECT pg_advisory_lock(:lock_id, hashtext(:key))'), params)
+                granted = False
+            except OperationalError:
+                app.logger.warn(f'Timed out after {timeout_seconds}s waiting for advisory lock ({lock_id}, {key})')
+                granted = None
+            finally:
+                lock_connection.execute(text('RESET lock_timeout'))
+        try:
+            yield granted
+        finally:
+            if granted is not None:
+                lock_connection.execute(text('SELECT pg_advisory_unlock(:lock_id, hashtext(:key))'), params)
+
+
 def get_granted_lock_ids():
-    return select_column("SELECT objid from pg_locks where locktype = 'advisory' and granted = true")
+    # Single-key locks only; two-key locks report their first key as classid and their second as objid, with objsubid 2.
+    return select_column("SELECT objid from pg_locks where locktype = 'advisory' and granted = true and objsubid = 1")
@@ -0,0 +1,75 @@
+/**
+ * Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+ *
+ * Permission to use, copy, modify, and distribute this software and its documentation
+ * for educational, research, and not-for-profit purposes, without fee and without a
+ * signed licensing agreement, is hereby granted, provided that the above copyright
+ * notice, this paragraph and the following two paragraphs appear in all copies,
+ * modifications, and distributions.
+ *
+ * Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+ * Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+ * http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+ *
+ * IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+ * INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+ * THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+ * OF THE POSSIBILITY OF SUCH DAMAGE.
+ *
+ * REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+ * SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+ * "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ * ENHANCEMENTS, OR MODIFICATIONS.
+ */
+
+-- Upstream SIS rows for a refreshed term are loaded into these tables by the configured loch source. Snapshot CSV files
+-- must have a header row and columns in the order below. Tables are dropped when the refresh is committed.
+
+CREATE TEMPORARY TABLE loch_source_sis_terms (
+    term_id VARCHAR(4),
+    term_name VARCHAR(80),
+    term_begins DATE,
+    term_ends DATE
+) ON COMMIT DROP;
+
+CREATE TEMPORARY TABLE loch_source_sis_sections (
+    term_id VARCHAR(4),
+    course_number VARCHAR(5),
+    subject_area VARCHAR(80),
+    catalog_id VARCHAR(80),
+    instruction_format VARCHAR(80),
+    section_num VARCHAR(80),
+    course_title VARCHAR,
+    is_primary BOOLEAN,
+    instructor_uid VARCHAR(80),
+    instructor_role_code VARCHAR(80),
+    meeting_location VARCHAR,
+    meeting_days VARCHAR(80),
+    meeting_start_time VARCHAR(80),
+    meeting_end_time VARCHAR(80),
+    meeting_start_date DATE,
+    meeting_end_date DATE
+) ON COMMIT DROP;
+
+CREATE TEMPORARY TABLE loch_source_sis_instructors (
+    ldap_uid VARCHAR(80),
+    sis_id VARCHAR(80),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    email_address VARCHAR(255),
+    affiliations TEXT
+) ON COMMIT DROP;
+
+CREATE TEMPORARY TABLE loch_source_sis_enrollments (
+    term_id VARCHAR(4),
+    course_number VARCHAR(5),
+    ldap_uid VARCHAR(80)
+) ON COMMIT DROP;
+
+CREATE TEMPORARY TABLE loch_source_course_listings (
+    course_number VARCHAR(5),
+    cs_course_id VARCHAR(80),
+    session_code VARCHAR(5),
+    sis_section_num VARCHAR(5)
+) ON COMMIT DROP;
@@ -0,0 +1,126 @@
+/**
+ * Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+ *
+ * Permission to use, copy, modify, and distribute this software and its documentation
+ * for educational, research, and not-for-profit purposes, without fee and without a
+ * signed licensing agreement, is hereby granted, provided that the above copyright
+ * notice, this paragraph and the following two paragraphs appear in all copies,
+ * modifications, and distributions.
+ *
+ * Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+ * Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+ * http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+ *
+ * IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+ * INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+ * THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+ * OF THE POSSIBILITY OF SUCH DAMAGE.
+ *
+ * REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+ * SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+ * "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ * ENHANCEMENTS, OR MODIFICATIONS.
+ */
+
+INSERT INTO loch_source_sis_terms
+(SELECT * FROM
+  dblink('{dblink_nessie_rds}',$NESSIE$
+    SELECT term_id, term_name, term_begins, term_ends
+    FROM terms.term_definitions
+  $NESSIE$)
+  AS nessie_sis_terms (
+    term_id VARCHAR(4),
+    term_name VARCHAR(80),
+    term_begins DATE,
+    term_ends DATE
+  )
+);
+
+INSERT INTO loch_source_sis_sections
+  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
+    SELECT
+        sis_term_id AS term_id, sis_section_id AS course_number,
+        (string_to_array(sis_course_name, ' '))[1] AS subject_area,
+        (string_to_array(sis_course_name, ' '))[2] AS catalog_id,
+        sis_instruction_format AS instruction_format,
+        sis_section_num AS section_num,
+        sis_course_title AS course_title,
+        is_primary,
+        instructor_uid, instructor_role_code,
+        meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date
+    FROM sis_data.sis_sections
+    WHERE sis_term_id='{term_id}'
+  $NESSIE$)
+  AS nessie_sis_sections (
+    term_id VARCHAR(4),
+    course_number VARCHAR(5),
+    subject_area VARCHAR(80),
+    catalog_id VARCHAR(80),
+    instruction_format VARCHAR(80),
+    section_num VARCHAR(80),
+    course_title VARCHAR,
+    is_primary BOOLEAN,
+    instructor_uid VARCHAR(80),
+    instructor_role_code VARCHAR(80),
+    meeting_location VARCHAR,
+    meeting_days VARCHAR(80),
+    meeting_start_time VARCHAR(80),
+    meeting_end_time VARCHAR(80),
+    meeting_start_date DATE,
+    meeting_end_date DATE
+  )
+);
+
+INSERT INTO loch_source_sis_instructors
+  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
+    SELECT DISTINCT
+        ba.ldap_uid, ba.sid AS sis_id, ba.first_name, ba.last_name, ba.email_address, ba.affiliations
+    FROM sis_data.basic_attributes ba
+    JOIN sis_data.sis_sections s
+      ON s.sis_term_id='{term_id}'
+      AND s.instructor_uid = ba.ldap_uid
+    $NESSIE$)
+    AS nessie_sis_instructors (
+      ldap_uid VARCHAR(80),
+      sis_id VARCHAR(80),
+      first_name VARCHAR(255),
+      last_name VARCHAR(255),
+      email_address VARCHAR(255),
+      affiliations TEXT
+    )
+  );
+
+INSERT INTO loch_source_sis_enrollments
+  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
+    SELECT
+        sis_term_id AS term_id,
+        sis_section_id AS course_number,
+        ldap_uid
+    FROM sis_data.sis_enrollments e
+    WHERE e.sis_term_id='{term_id}'
+  $NESSIE$)
+  AS nessie_sis_enrollments (
+    term_id VARCHAR(4),
+    course_number VARCHAR(5),
+    ldap_uid VARCHAR(80)
+  )
+);
+
+INSERT INTO loch_source_course_listings
+  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
+    SELECT
+      sis_section_id AS course_number,
+      cs_course_id,
+      session_code,
+      sis_section_num
+    FROM sis_data.sis_sections
+    WHERE sis_term_id='{term_id}'
+  $NESSIE$)
+  AS nessie_course_listings (
+    course_number VARCHAR(5),
+    cs_course_id VARCHAR(80),
+    session_code VARCHAR(5),
+    sis_section_num VARCHAR(5)
+  )
+);
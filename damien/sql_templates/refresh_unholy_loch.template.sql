@@ -23,208 +23,230 @@
  * ENHANCEMENTS, OR MODIFICATIONS.
  */
 
-CREATE TABLE tmp_sis_sections AS SELECT * FROM unholy_loch.sis_sections WHERE term_id = '{term_id}';
+-- Each phase below is run and timed separately by the refresh job, within a single transaction. Upstream SIS rows have
+-- already been loaded into loch_source_* tables by the configured loch source.
+
+-- Phase: sections
+
 CREATE TABLE tmp_sis_instructors AS SELECT * FROM unholy_loch.sis_instructors;
+CREATE TEMPORARY TABLE tmp_co_schedulings AS SELECT * FROM unholy_loch.co_schedulings WHERE term_id = '{term_id}';
+CREATE TEMPORARY TABLE tmp_cross_listings AS SELECT * FROM unholy_loch.cross_listings WHERE term_id = '{term_id}';
+
+-- Refreshed tables are built into shadow copies and swapped in at the end, so that readers keep seeing current data and
+-- wait only on the swap itself. Term-partitioned tables are rebuilt for this term only and attached as its partition.
+
+CREATE TABLE unholy_loch.sis_sections_shadow (LIKE unholy_loch.sis_sections INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+CREATE TABLE unholy_loch.sis_enrollments_shadow (LIKE unholy_loch.sis_enrollments INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+CREATE TABLE unholy_loch.cross_listings_shadow (LIKE unholy_loch.cross_listings INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+CREATE TABLE unholy_loch.co_schedulings_shadow (LIKE unholy_loch.co_schedulings INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+CREATE TABLE unholy_loch.sis_instructors_shadow (LIKE unholy_loch.sis_instructors INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+CREATE TABLE unholy_loch.sis_terms_shadow (LIKE unholy_loch.sis_terms INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+
+INSERT INTO unholy_loch.sis_sections_shadow SELECT * FROM unholy_loch.sis_sections WHERE term_id = '{term_id}';
 
 --
 
-DELETE FROM public.json_cache WHERE term_id = '{term_id}';
+-- Changes found by this refresh are recorded so that only cached feeds for affected sections, departments and instructors
+-- are invalidated once the refresh completes. Changes not yet consumed by a committed invalidation are kept for the next.
+
+DELETE FROM unholy_loch.sis_section_changes WHERE term_id = '{term_id}' AND consumed_at IS NOT NULL;
 
 --
 
-TRUNCATE unholy_loch.sis_terms;
-
-INSERT INTO unholy_loch.sis_terms(term_id, term_name, term_begins, term_ends)
-(SELECT * FROM
-  dblink('{dblink_nessie_rds}',$NESSIE$
-    SELECT term_id, term_name, term_begins, term_ends
-    FROM terms.term_definitions
-  $NESSIE$)
-  AS nessie_sis_terms (
-    term_id VARCHAR(4),
-    term_name VARCHAR(80),
-    term_begins DATE,
-    term_ends DATE
-  )
-);
+INSERT INTO unholy_loch.sis_terms_shadow(term_id, term_name, term_begins, term_ends)
+(SELECT * FROM loch_source_sis_terms);
 
 --
 
-DELETE FROM unholy_loch.sis_sections WHERE term_id = '{term_id}';
+-- The new snapshot is loaded into staging and compared with current sections, so that only changed sections are rewritten.
 
-INSERT INTO unholy_loch.sis_sections (term_id, course_number,
+CREATE TEMPORARY TABLE tmp_sis_sections_staging (LIKE unholy_loch.sis_sections);
+
+INSERT INTO tmp_sis_sections_staging (term_id, course_number,
                           subject_area, catalog_id, instruction_format, section_num,
                           course_title, is_primary,
                           instructor_uid, instructor_role_code,
                           meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date,
                           created_at)
-   (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
-    SELECT
-        sis_term_id AS term_id, sis_section_id AS course_number,
-        (string_to_array(sis_course_name, ' '))[1] AS subject_area,
-        (string_to_array(sis_course_name, ' '))[2] AS catalog_id,
-        sis_instruction_format AS instruction_format,
-        sis_section_num AS section_num,
-        sis_course_title AS course_title,
-        is_primary,
-        instructor_uid, instructor_role_code,
-        meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date,
-        now() AS created_at
-    FROM sis_data.sis_sections
-    WHERE sis_term_id='{term_id}'
-  $NESSIE$)
-  AS nessie_sis_sections (
-    term_id VARCHAR(4),
-    course_number VARCHAR(5),
-    subject_area VARCHAR(80),
-    catalog_id VARCHAR(80),
-    instruction_format VARCHAR(80),
-    section_num VARCHAR(80),
-    course_title VARCHAR,
-    is_primary BOOLEAN,
-    instructor_uid VARCHAR(80),
-    instructor_role_code VARCHAR(80),
-    meeting_location VARCHAR,
-    meeting_days VARCHAR(80),
-    meeting_start_time VARCHAR(80),
-    meeting_end_time VARCHAR(80),
-    meeting_start_date DATE,
-    meeting_end_date DATE,
-    created_at TIMESTAMP WITH TIME ZONE
-  )
-);
+  (SELECT *, now() AS created_at FROM loch_source_sis_sections);
 
 -- Our source data may use blank spaces for UIDs that should be null.
-UPDATE unholy_loch.sis_sections SET instructor_uid = NULL WHERE instructor_uid = '';
+UPDATE tmp_sis_sections_staging SET instructor_uid = NULL WHERE instructor_uid = '';
 
--- Preserve older created_at timestamps where present.
-UPDATE unholy_loch.sis_sections s
-SET created_at = t.created_at
-FROM tmp_sis_sections t
-WHERE s.term_id = t.term_id AND s.course_number = t.course_number;
+-- A course number is changed if any of its rows, including instructor assignments, differ between current and staged sections.
+-- Section changes found by this refresh are collected apart from any left unconsumed by earlier refreshes.
+CREATE TEMPORARY TABLE tmp_sis_section_changes (
+    course_number VARCHAR(5) NOT NULL,
+    change VARCHAR(20) NOT NULL
+);
 
--- Restore deleted sections, with deleted_at set to now() if no previous value.
-INSERT INTO unholy_loch.sis_sections (term_id, course_number,
+INSERT INTO tmp_sis_section_changes (course_number, change)
+WITH current_sections AS (
+  SELECT course_number, subject_area, catalog_id, instruction_format, section_num, course_title, is_primary,
+      instructor_uid, instructor_role_code,
+      meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date
+  FROM unholy_loch.sis_sections_shadow
+  WHERE term_id = '{term_id}' AND deleted_at IS NULL
+),
+staged_sections AS (
+  SELECT course_number, subject_area, catalog_id, instruction_format, section_num, course_title, is_primary,
+      instructor_uid, instructor_role_code,
+      meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date
+  FROM tmp_sis_sections_staging
+),
+changed AS (
+  SELECT course_number FROM (SELECT * FROM current_sections EXCEPT ALL SELECT * FROM staged_sections) removed
+  UNION
+  SELECT course_number FROM (SELECT * FROM staged_sections EXCEPT ALL SELECT * FROM current_sections) added
+)
+SELECT c.course_number,
+  CASE
+    WHEN NOT EXISTS (SELECT 1 FROM current_sections s WHERE s.course_number = c.course_number) THEN 'inserted'
+    WHEN NOT EXISTS (SELECT 1 FROM staged_sections s WHERE s.course_number = c.course_number) THEN 'deleted'
+    ELSE 'updated'
+  END
+FROM changed c;
+
+-- Sections missing from the new snapshot are kept, with deleted_at set to now().
+UPDATE unholy_loch.sis_sections_shadow s
+SET deleted_at = now()
+FROM tmp_sis_section_changes c
+WHERE c.change = 'deleted'
+AND s.term_id = '{term_id}' AND s.course_number = c.course_number AND s.deleted_at IS NULL;
+
+-- Inserted and updated sections are rewritten, preserving older created_at timestamps where present.
+CREATE TEMPORARY TABLE tmp_sis_sections_created AS
+  SELECT s.course_number, MIN(s.created_at) AS created_at
+  FROM unholy_loch.sis_sections_shadow s
+  JOIN tmp_sis_section_changes c
+    ON c.course_number = s.course_number AND c.change IN ('inserted', 'updated')
+  WHERE s.term_id = '{term_id}'
+  GROUP BY s.course_number;
+
+DELETE FROM unholy_loch.sis_sections_shadow s
+USING tmp_sis_section_changes c
+WHERE c.change IN ('inserted', 'updated')
+AND s.term_id = '{term_id}' AND s.course_number = c.course_number;
+
+INSERT INTO unholy_loch.sis_sections_shadow (term_id, course_number,
                           subject_area, catalog_id, instruction_format, section_num,
                           course_title, is_primary,
                           instructor_uid, instructor_role_code,
                           meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date,
-                          created_at, deleted_at)
-  (SELECT term_id, course_number,
-          subject_area, catalog_id, instruction_format, section_num,
-          course_title, is_primary,
-          instructor_uid, instructor_role_code,
-          meeting_location, meeting_days, meeting_start_time, meeting_end_time, meeting_start_date, meeting_end_date,
-          created_at, COALESCE(deleted_at, now()) AS deleted_at
-    FROM tmp_sis_sections
-    WHERE term_id || '-' || course_number NOT IN
-    (SELECT term_id || '-' || course_number FROM unholy_loch.sis_sections)
+                          created_at)
+  (SELECT s.term_id, s.course_number,
+          s.subject_area, s.catalog_id, s.instruction_format, s.section_num,
+          s.course_title, s.is_primary,
+          s.instructor_uid, s.instructor_role_code,
+          s.meeting_location, s.meeting_days, s.meeting_start_time, s.meeting_end_time, s.meeting_start_date, s.meeting_end_date,
+          COALESCE(t.created_at, s.created_at) AS created_at
+    FROM tmp_sis_sections_staging s
+    JOIN tmp_sis_section_changes c
+      ON c.course_number = s.course_number AND c.change IN ('inserted', 'updated')
+    LEFT JOIN tmp_sis_sections_created t ON t.course_number = s.course_number
   );
 
-DROP TABLE tmp_sis_sections;
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT '{term_id}', course_number, change FROM tmp_sis_section_changes;
+
+DROP TABLE tmp_sis_sections_created;
+DROP TABLE tmp_sis_sections_staging;
+DROP TABLE tmp_sis_section_changes;
 
 --
 
-TRUNCATE unholy_loch.sis_instructors;
+-- Phase: instructors
 
-INSERT INTO unholy_loch.sis_instructors
+INSERT INTO unholy_loch.sis_instructors_shadow
   (ldap_uid, sis_id, first_name, last_name, email_address, affiliations, created_at)
-  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
-    SELECT DISTINCT
-        ba.ldap_uid, ba.sid AS sis_id, ba.first_name, ba.last_name, ba.email_address, ba.affiliations,
-        now() AS created_at
-    FROM sis_data.basic_attributes ba
-    JOIN sis_data.sis_sections s
-      ON s.sis_term_id='{term_id}'
-      AND s.instructor_uid = ba.ldap_uid
-    $NESSIE$)
-    AS nessie_sis_instructors (
-      ldap_uid VARCHAR(80),
-      sis_id VARCHAR(80),
-      first_name VARCHAR(255),
-      last_name VARCHAR(255),
-      email_address VARCHAR(255),
-      affiliations TEXT,
-      created_at TIMESTAMP WITH TIME ZONE
-    )
-  );
+  (SELECT DISTINCT *, now() AS created_at FROM loch_source_sis_instructors);
 
 -- Preserve older created_at timestamps where present.
-UPDATE unholy_loch.sis_instructors i
+UPDATE unholy_loch.sis_instructors_shadow i
 SET created_at = t.created_at
 FROM tmp_sis_instructors t
 WHERE i.ldap_uid = t.ldap_uid;
 
 -- Restore deleted instructors, with deleted_at set to now().
-INSERT INTO unholy_loch.sis_instructors
+INSERT INTO unholy_loch.sis_instructors_shadow
   (ldap_uid, sis_id, first_name, last_name, email_address, affiliations, created_at, deleted_at)
   (SELECT ldap_uid, sis_id, first_name, last_name, email_address, affiliations,
       created_at, COALESCE(deleted_at, now()) AS deleted_at
     FROM tmp_sis_instructors
     WHERE ldap_uid NOT IN
-    (SELECT ldap_uid FROM unholy_loch.sis_instructors)
+    (SELECT ldap_uid FROM unholy_loch.sis_instructors_shadow)
   );
 
+-- Instructors whose attributes changed are recorded so that cached feeds naming them can be invalidated.
+INSERT INTO unholy_loch.sis_section_changes (term_id, instructor_uid, change)
+SELECT DISTINCT '{term_id}', ldap_uid, 'instructor' FROM (
+  (SELECT ldap_uid, sis_id, first_name, last_name, email_address, affiliations, deleted_at IS NULL AS is_active FROM tmp_sis_instructors
+    EXCEPT SELECT ldap_uid, sis_id, first_name, last_name, email_address, affiliations, deleted_at IS NULL AS is_active FROM unholy_loch.sis_instructors_shadow)
+  UNION
+  (SELECT ldap_uid, sis_id, first_name, last_name, email_address, affiliations, deleted_at IS NULL AS is_active FROM unholy_loch.sis_instructors_shadow
+    EXCEPT SELECT ldap_uid, sis_id, first_name, last_name, email_address, affiliations, deleted_at IS NULL AS is_active FROM tmp_sis_instructors)
+) changed;
+
 DROP TABLE tmp_sis_instructors;
 
 -- Any current-term evaluations not yet confirmed or marked which refer to deleted instructors should have the instructor UID removed.
+WITH updated AS (
 UPDATE evaluations
   SET instructor_uid = NULL, updated_by = '0'
   WHERE term_id = '{term_id}'
   AND id IN (
   SELECT e.id FROM evaluations e
-    JOIN unholy_loch.sis_instructors i
+    JOIN unholy_loch.sis_instructors_shadow i
       ON i.ldap_uid = e.instructor_uid
       AND i.deleted_at IS NOT NULL
       AND (e.status IS NULL OR e.status NOT IN ('confirmed', 'marked'))
     LEFT JOIN supplemental_instructors si
       ON i.ldap_uid = si.ldap_uid
       WHERE si.ldap_uid IS NULL OR si.deleted_at IS NOT NULL
-);
+  )
+  RETURNING term_id, course_number
+)
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT DISTINCT term_id, course_number, 'evaluation' FROM updated;
 
 --
 
-DELETE FROM unholy_loch.sis_enrollments WHERE term_id = '{term_id}';
+-- Phase: enrollments
 
-INSERT INTO unholy_loch.sis_enrollments
+INSERT INTO unholy_loch.sis_enrollments_shadow
   (term_id, course_number, ldap_uid)
-  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
-    SELECT
-        sis_term_id AS term_id,
-        sis_section_id AS course_number,
-        ldap_uid
-    FROM sis_data.sis_enrollments e
-    WHERE e.sis_term_id='{term_id}'
-  $NESSIE$)
-  AS nessie_sis_enrollments (
-    term_id VARCHAR(4),
-    course_number VARCHAR(5),
-    ldap_uid VARCHAR(80)
-  )
-);
+  (SELECT * FROM loch_source_sis_enrollments);
 
 WITH ec AS (
   SELECT s.term_id, s.course_number, COUNT(DISTINCT e.ldap_uid) as enrollment_count
-  FROM unholy_loch.sis_sections s
-  LEFT JOIN unholy_loch.sis_enrollments e
+  FROM unholy_loch.sis_sections_shadow s
+  LEFT JOIN unholy_loch.sis_enrollments_shadow e
   ON s.term_id = e.term_id
   AND s.course_number = e.course_number
+  WHERE s.term_id = '{term_id}'
   GROUP BY s.term_id, s.course_number
+),
+updated AS (
+  UPDATE unholy_loch.sis_sections_shadow s
+  SET enrollment_count = ec.enrollment_count
+  FROM ec
+  WHERE s.term_id = ec.term_id AND s.course_number = ec.course_number
+  AND s.enrollment_count IS DISTINCT FROM ec.enrollment_count
+  RETURNING s.term_id, s.course_number
 )
-UPDATE unholy_loch.sis_sections s
-SET enrollment_count = ec.enrollment_count
-FROM ec
-WHERE s.term_id = ec.term_id AND s.course_number = ec.course_number;
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT DISTINCT term_id, course_number, 'enrollment' FROM updated;
 
 --
 
 -- In the special case of a confirmed evaluation for a zero-enrollment course, ensure the section is present
 -- in the supplemental_sections table so that it will appear in the Damien UI.
 
+WITH inserted AS (
 INSERT INTO supplemental_sections (term_id, course_number, department_id)
 SELECT eval.term_id, eval.course_number, eval.department_id
   FROM evaluations eval
-  LEFT JOIN unholy_loch.sis_enrollments enr
+  LEFT JOIN unholy_loch.sis_enrollments_shadow enr
     ON enr.term_id = eval.term_id
     AND enr.course_number = eval.course_number
   WHERE
@@ -232,11 +254,15 @@ SELECT eval.term_id, eval.course_number, eval.department_id
     AND eval.status = 'confirmed'
     AND enr.course_number IS NULL
     AND eval.course_number NOT IN (
-      SELECT course_number FROM supplemental_sections WHERE term_id = '{term_id}' AND deleted_at IS NULL);
+      SELECT course_number FROM supplemental_sections WHERE term_id = '{term_id}' AND deleted_at IS NULL)
+  RETURNING term_id, course_number
+)
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT DISTINCT term_id, course_number, 'supplemental' FROM inserted;
 
 --
 
-DELETE FROM unholy_loch.co_schedulings WHERE term_id = '{term_id}';
+-- Phase: cross-listings
 
 WITH schedules AS (
   SELECT
@@ -250,7 +276,7 @@ WITH schedules AS (
           meeting_start_date,
           meeting_start_time
       )) as schedule
-  FROM unholy_loch.sis_sections
+  FROM unholy_loch.sis_sections_shadow
   WHERE
       term_id = '{term_id}'
       AND meeting_days <> ''
@@ -262,34 +288,95 @@ WITH schedules AS (
       AND meeting_start_time <> ''
       AND deleted_at IS NULL
 )
-INSERT INTO unholy_loch.co_schedulings(term_id, course_number, room_share_number)
+INSERT INTO unholy_loch.co_schedulings_shadow(term_id, course_number, room_share_number)
 SELECT s1.term_id, s1.course_number, s2.course_number AS room_share_number
 FROM schedules s1 JOIN schedules s2
 ON s1.schedule = s2.schedule
 AND s1.course_number != s2.course_number;
 
-DELETE FROM unholy_loch.cross_listings WHERE term_id = '{term_id}';
-
-WITH course_listings AS (
-  (SELECT * FROM dblink('{dblink_nessie_rds}',$NESSIE$
-    SELECT
-      sis_section_id AS course_number,
-      cs_course_id,
-      session_code,
-      sis_section_num
-    FROM sis_data.sis_sections
-    WHERE sis_term_id='{term_id}'
-  $NESSIE$)
-  AS nessie_course_listings (
-    course_number VARCHAR(5),
-    cs_course_id VARCHAR(80),
-    session_code VARCHAR(5),
-    sis_section_num VARCHAR(5)
-  )))
-INSERT INTO unholy_loch.cross_listings(term_id, course_number, cross_listing_number)
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT DISTINCT '{term_id}', course_number, 'room_share' FROM (
+  (SELECT course_number, room_share_number FROM tmp_co_schedulings
+    EXCEPT SELECT course_number, room_share_number FROM unholy_loch.co_schedulings_shadow WHERE term_id = '{term_id}')
+  UNION
+  (SELECT course_number, room_share_number FROM unholy_loch.co_schedulings_shadow WHERE term_id = '{term_id}'
+    EXCEPT SELECT course_number, room_share_number FROM tmp_co_schedulings)
+) changed;
+
+DROP TABLE tmp_co_schedulings;
+
+WITH course_listings AS (SELECT * FROM loch_source_course_listings)
+INSERT INTO unholy_loch.cross_listings_shadow(term_id, course_number, cross_listing_number)
 SELECT '{term_id}' AS term_id, cl1.course_number, cl2.course_number AS cross_listing_number
 FROM course_listings cl1 JOIN course_listings cl2
 ON cl1.cs_course_id = cl2.cs_course_id
 AND cl1.session_code = cl2.session_code
 AND cl1.sis_section_num = cl2.sis_section_num
 AND cl1.course_number != cl2.course_number;
+
+INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, change)
+SELECT DISTINCT '{term_id}', course_number, 'cross_listing' FROM (
+  (SELECT course_number, cross_listing_number FROM tmp_cross_listings
+    EXCEPT SELECT course_number, cross_listing_number FROM unholy_loch.cross_listings_shadow WHERE term_id = '{term_id}')
+  UNION
+  (SELECT course_number, cross_listing_number FROM unholy_loch.cross_listings_shadow WHERE term_id = '{term_id}'
+    EXCEPT SELECT course_number, cross_listing_number FROM tmp_cross_listings)
+) changed;
+
+DROP TABLE tmp_cross_listings;
+
+--
+
+-- Phase: swap
+
+-- Partition indexes are built before the swap, named as they would be if created through the parent table.
+
+CREATE INDEX sis_sections_shadow_term_id_course_number_idx ON unholy_loch.sis_sections_shadow USING btree (term_id, course_number);
+CREATE INDEX sis_enrollments_shadow_term_id_course_number_ldap_uid_idx ON unholy_loch.sis_enrollments_shadow USING btree (term_id, course_number, ldap_uid);
+CREATE INDEX cross_listings_shadow_term_id_course_number_idx ON unholy_loch.cross_listings_shadow USING btree (term_id, course_number);
+CREATE INDEX cross_listings_shadow_term_id_cross_listing_number_idx ON unholy_loch.cross_listings_shadow USING btree (term_id, cross_listing_number);
+CREATE INDEX co_schedulings_shadow_term_id_course_number_idx ON unholy_loch.co_schedulings_shadow USING btree (term_id, course_number);
+CREATE INDEX co_schedulings_shadow_term_id_room_share_number_idx ON unholy_loch.co_schedulings_shadow USING btree (term_id, room_share_number);
+CREATE INDEX sis_instructors_shadow_ldap_uid_idx ON unholy_loch.sis_instructors_shadow USING btree (ldap_uid);
+
+ANALYZE unholy_loch.sis_sections_shadow;
+ANALYZE unholy_loch.sis_instructors_shadow;
+ANALYZE unholy_loch.sis_enrollments_shadow;
+ANALYZE unholy_loch.sis_terms_shadow;
+ANALYZE unholy_loch.cross_listings_shadow;
+ANALYZE unholy_loch.co_schedulings_shadow;
+
+-- The swap takes brief exclusive locks on the current tables, held until the refresh is committed. Rows for this term
+-- loaded into a default partition before the term had its own are replaced by the new partition.
+
+DROP TABLE IF EXISTS unholy_loch.sis_sections_{term_id};
+DELETE FROM unholy_loch.sis_sections_default WHERE term_id = '{term_id}';
+ALTER TABLE unholy_loch.sis_sections_shadow RENAME TO sis_sections_{term_id};
+ALTER INDEX unholy_loch.sis_sections_shadow_term_id_course_number_idx RENAME TO sis_sections_{term_id}_term_id_course_number_idx;
+ALTER TABLE unholy_loch.sis_sections ATTACH PARTITION unholy_loch.sis_sections_{term_id} FOR VALUES IN ('{term_id}');
+
+DROP TABLE IF EXISTS unholy_loch.sis_enrollments_{term_id};
+DELETE FROM unholy_loch.sis_enrollments_default WHERE term_id = '{term_id}';
+ALTER TABLE unholy_loch.sis_enrollments_shadow RENAME TO sis_enrollments_{term_id};
+ALTER INDEX unholy_loch.sis_enrollments_shadow_term_id_course_number_ldap_uid_idx RENAME TO sis_enrollments_{term_id}_term_id_course_number_ldap_uid_idx;
+ALTER TABLE unholy_loch.sis_enrollments ATTACH PARTITION unholy_loch.sis_enrollments_{term_id} FOR VALUES IN ('{term_id}');
+
+DROP TABLE IF EXISTS unholy_loch.cross_listings_{term_id};
+DELETE FROM unholy_loch.cross_listings_default WHERE term_id = '{term_id}';
+ALTER TABLE unholy_loch.cross_listings_shadow RENAME TO cross_listings_{term_id};
+ALTER INDEX unholy_loch.cross_listings_shadow_term_id_course_number_idx RENAME TO cross_listings_{term_id}_term_id_course_number_idx;
+ALTER INDEX unholy_loch.cross_listings_shadow_term_id_cross_listing_number_idx RENAME TO cross_listings_{term_id}_term_id_cross_listing_number_idx;
+ALTER TABLE unholy_loch.cross_listings ATTACH PARTITION unholy_loch.cross_listings_{term_id} FOR VALUES IN ('{term_id}');
+
+DROP TABLE IF EXISTS unholy_loch.co_schedulings_{term_id};
+DELETE FROM unholy_loch.co_schedulings_default WHERE term_id = '{term_id}';
+ALTER TABLE unholy_loch.co_schedulings_shadow RENAME TO co_schedulings_{term_id};
+ALTER INDEX unholy_loch.co_schedulings_shadow_term_id_course_number_idx RENAME TO co_schedulings_{term_id}_term_id_course_number_idx;
+ALTER INDEX unholy_loch.co_schedulings_shadow_term_id_room_share_number_idx RENAME TO co_schedulings_{term_id}_term_id_room_share_number_idx;
+ALTER TABLE unholy_loch.co_schedulings ATTACH PARTITION unholy_loch.co_schedulings_{term_id} FOR VALUES IN ('{term_id}');
+
+DROP TABLE unholy_loch.sis_instructors;
+ALTER TABLE unholy_loch.sis_instructors_shadow RENAME TO sis_instructors;
+ALTER INDEX unholy_loch.sis_instructors_shadow_ldap_uid_idx RENAME TO sis_instructors_ldap_uid_idx;
+DROP TABLE unholy_loch.sis_terms;
+ALTER TABLE unholy_loch.sis_terms_shadow RENAME TO sis_terms;
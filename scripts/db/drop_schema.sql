@@ -48,6 +48,11 @@ ALTER TABLE IF EXISTS ONLY public.department_members DROP CONSTRAINT IF EXISTS d
 
 ALTER TABLE IF EXISTS ONLY public.department_notes DROP CONSTRAINT IF EXISTS department_notes_department_id_fkey;
 
+ALTER TABLE IF EXISTS ONLY public.department_sections DROP CONSTRAINT IF EXISTS department_sections_department_id_fkey;
+ALTER TABLE IF EXISTS ONLY public.department_section_refreshes DROP CONSTRAINT IF EXISTS department_section_refreshes_department_id_fkey;
+
+ALTER TABLE IF EXISTS ONLY public.json_cache_dependencies DROP CONSTRAINT IF EXISTS json_cache_dependencies_cache_id_fkey;
+
 ALTER TABLE IF EXISTS ONLY public.user_department_forms DROP CONSTRAINT IF EXISTS user_department_forms_user_id_fkey;
 ALTER TABLE IF EXISTS ONLY public.user_department_forms DROP CONSTRAINT IF EXISTS user_department_forms_department_form_id_fkey;
 
@@ -63,6 +68,9 @@ ALTER TABLE IF EXISTS ONLY public.department_members DROP CONSTRAINT IF EXISTS d
 
 ALTER TABLE IF EXISTS ONLY public.department_notes DROP CONSTRAINT IF EXISTS department_notes_pkey;
 
+ALTER TABLE IF EXISTS ONLY public.department_sections DROP CONSTRAINT IF EXISTS department_sections_pkey;
+ALTER TABLE IF EXISTS ONLY public.department_section_refreshes DROP CONSTRAINT IF EXISTS department_section_refreshes_pkey;
+
 ALTER TABLE IF EXISTS ONLY public.departments DROP CONSTRAINT IF EXISTS departments_pkey;
 ALTER TABLE IF EXISTS public.departments ALTER COLUMN id DROP DEFAULT;
 
@@ -73,9 +81,16 @@ ALTER TABLE IF EXISTS public.evaluation_types ALTER COLUMN id DROP DEFAULT;
 
 ALTER TABLE IF EXISTS ONLY public.evaluations DROP CONSTRAINT IF EXISTS evaluations_pkey;
 
+ALTER TABLE IF EXISTS ONLY public.job_runs DROP CONSTRAINT IF EXISTS job_runs_pkey;
+ALTER TABLE IF EXISTS public.job_runs ALTER COLUMN id DROP DEFAULT;
+
 ALTER TABLE IF EXISTS ONLY public.json_cache DROP CONSTRAINT IF EXISTS json_cache_pkey;
 ALTER TABLE IF EXISTS public.json_cache ALTER COLUMN id DROP DEFAULT;
 
+ALTER TABLE IF EXISTS ONLY public.json_cache_dependencies DROP CONSTRAINT IF EXISTS json_cache_dependencies_pkey;
+
+ALTER TABLE IF EXISTS ONLY public.json_cache_epochs DROP CONSTRAINT IF EXISTS json_cache_epochs_pkey;
+
 ALTER TABLE IF EXISTS ONLY public.supplemental_sections DROP CONSTRAINT IF EXISTS supplemental_sections_pkey;
 ALTER TABLE IF EXISTS public.supplemental_sections ALTER COLUMN id DROP DEFAULT;
 
@@ -109,6 +124,9 @@ DROP TABLE IF EXISTS public.department_members CASCADE;
 
 DROP TABLE IF EXISTS public.department_notes CASCADE;
 
+DROP TABLE IF EXISTS public.department_sections CASCADE;
+DROP TABLE IF EXISTS public.department_section_refreshes CASCADE;
+
 DROP SEQUENCE IF EXISTS public.departments_id_seq;
 DROP TABLE IF EXISTS public.departments CASCADE;
 
@@ -120,9 +138,17 @@ DROP TABLE IF EXISTS public.evaluation_types CASCADE;
 DROP SEQUENCE IF EXISTS public.evaluations_id_seq CASCADE;
 DROP TABLE IF EXISTS public.evaluations CASCADE;
 
+DROP SEQUENCE IF EXISTS public.job_runs_id_seq;
+DROP TABLE IF EXISTS public.job_runs CASCADE;
+
 DROP SEQUENCE IF EXISTS public.json_cache_id_seq CASCADE;
 DROP TABLE IF EXISTS public.json_cache CASCADE;
 
+DROP TABLE IF EXISTS public.json_cache_dependencies CASCADE;
+
+DROP SEQUENCE IF EXISTS public.json_cache_epoch_seq;
+DROP TABLE IF EXISTS public.json_cache_epochs CASCADE;
+
 DROP TABLE IF EXISTS public.supplemental_instructors CASCADE;
 
 DROP SEQUENCE IF EXISTS public.supplemental_sections_id_seq;
@@ -138,4 +164,5 @@ DROP TABLE IF EXISTS public.users CASCADE;
 
 DROP TYPE IF EXISTS public.evaluation_status;
 DROP TYPE IF EXISTS public.export_status;
+DROP TYPE IF EXISTS public.job_run_status;
 DROP TYPE IF EXISTS public.user_blue_permissions;
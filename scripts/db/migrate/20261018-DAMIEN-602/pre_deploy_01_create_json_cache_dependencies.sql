@@ -0,0 +1,44 @@
+/**
+ * Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+ *
+ * Permission to use, copy, modify, and distribute this software and its documentation
+ * for educational, research, and not-for-profit purposes, without fee and without a
+ * signed licensing agreement, is hereby granted, provided that the above copyright
+ * notice, this paragraph and the following two paragraphs appear in all copies,
+ * modifications, and distributions.
+ *
+ * Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+ * Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+ * http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+ *
+ * IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+ * INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+ * THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+ * OF THE POSSIBILITY OF SUCH DAMAGE.
+ *
+ * REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+ * SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+ * "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ * ENHANCEMENTS, OR MODIFICATIONS.
+ */
+
+BEGIN;
+
+CREATE TABLE json_cache_dependencies (
+    cache_id INTEGER NOT NULL,
+    kind VARCHAR(32) NOT NULL,
+    value VARCHAR(255) NOT NULL
+);
+
+ALTER TABLE ONLY json_cache_dependencies
+    ADD CONSTRAINT json_cache_dependencies_pkey PRIMARY KEY (kind, value, cache_id);
+ALTER TABLE ONLY json_cache_dependencies
+    ADD CONSTRAINT json_cache_dependencies_cache_id_fkey FOREIGN KEY (cache_id) REFERENCES json_cache(id) ON DELETE CASCADE;
+
+CREATE INDEX json_cache_dependencies_cache_id_idx ON json_cache_dependencies USING btree(cache_id);
+
+-- Section caches written before this migration have no recorded dependencies, and are cleared to be rebuilt with them.
+DELETE FROM json_cache;
+
+COMMIT;
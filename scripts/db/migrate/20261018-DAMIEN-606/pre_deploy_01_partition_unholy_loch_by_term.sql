@@ -0,0 +1,62 @@
+/**
+ * Copyright ©2024. The Regents of the University of California (Regents). All Rights Reserved.
+ *
+ * Permission to use, copy, modify, and distribute this software and its documentation
+ * for educational, research, and not-for-profit purposes, without fee and without a
+ * signed licensing agreement, is hereby granted, provided that the above copyright
+ * notice, this paragraph and the following two paragraphs appear in all copies,
+ * modifications, and distributions.
+ *
+ * Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+ * Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+ * http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+ *
+ * IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+ * INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+ * THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+ * OF THE POSSIBILITY OF SUCH DAMAGE.
+ *
+ * REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+ * IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+ * SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+ * "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ * ENHANCEMENTS, OR MODIFICATIONS.
+ */
+
+BEGIN;
+
+-- Term-keyed unholy_loch tables are rebuilt as LIST partitions by term_id, with a partition per existing term and a
+-- default partition for terms not yet refreshed.
+
+DO $$
+DECLARE
+  t VARCHAR;
+  term VARCHAR;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['sis_sections', 'sis_enrollments', 'cross_listings', 'co_schedulings'] LOOP
+    EXECUTE format('ALTER TABLE unholy_loch.%I RENAME TO %I', t, t || '_unpartitioned');
+    EXECUTE format('CREATE TABLE unholy_loch.%I (LIKE unholy_loch.%I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY LIST (term_id)',
+      t, t || '_unpartitioned');
+    EXECUTE format('CREATE TABLE unholy_loch.%I PARTITION OF unholy_loch.%I DEFAULT', t || '_default', t);
+    FOR term IN EXECUTE format('SELECT DISTINCT term_id FROM unholy_loch.%I', t || '_unpartitioned') LOOP
+      EXECUTE format('CREATE TABLE unholy_loch.%I PARTITION OF unholy_loch.%I FOR VALUES IN (%L)', t || '_' || term, t, term);
+    END LOOP;
+    EXECUTE format('INSERT INTO unholy_loch.%I SELECT * FROM unholy_loch.%I', t, t || '_unpartitioned');
+    EXECUTE format('DROP TABLE unholy_loch.%I', t || '_unpartitioned');
+  END LOOP;
+END $$;
+
+CREATE INDEX sis_sections_term_id_course_number_idx ON unholy_loch.sis_sections USING btree (term_id, course_number);
+CREATE INDEX sis_enrollments_term_id_course_number_ldap_uid_idx ON unholy_loch.sis_enrollments USING btree (term_id, course_number, ldap_uid);
+CREATE INDEX cross_listings_term_id_course_number_idx ON unholy_loch.cross_listings USING btree (term_id, course_number);
+CREATE INDEX cross_listings_term_id_cross_listing_number_idx ON unholy_loch.cross_listings USING btree (term_id, cross_listing_number);
+CREATE INDEX co_schedulings_term_id_course_number_idx ON unholy_loch.co_schedulings USING btree (term_id, course_number);
+CREATE INDEX co_schedulings_term_id_room_share_number_idx ON unholy_loch.co_schedulings USING btree (term_id, room_share_number);
+CREATE INDEX IF NOT EXISTS sis_instructors_ldap_uid_idx ON unholy_loch.sis_instructors USING btree (ldap_uid);
+
+ANALYZE unholy_loch.sis_sections;
+ANALYZE unholy_loch.sis_enrollments;
+ANALYZE unholy_loch.cross_listings;
+ANALYZE unholy_loch.co_schedulings;
+
+COMMIT;
@@ -117,6 +117,28 @@ ALTER TABLE ONLY department_notes
 
 --
 
+CREATE TABLE department_sections (
+    term_id VARCHAR(4) NOT NULL,
+    department_id INTEGER NOT NULL,
+    course_number VARCHAR(5) NOT NULL
+);
+
+ALTER TABLE ONLY department_sections
+    ADD CONSTRAINT department_sections_pkey PRIMARY KEY (term_id, department_id, course_number);
+
+--
+
+CREATE TABLE department_section_refreshes (
+    term_id VARCHAR(4) NOT NULL,
+    department_id INTEGER NOT NULL,
+    refreshed_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+ALTER TABLE ONLY department_section_refreshes
+    ADD CONSTRAINT department_section_refreshes_pkey PRIMARY KEY (term_id, department_id);
+
+--
+
 CREATE TABLE departments (
     id integer NOT NULL,
     dept_name character varying(255) NOT NULL,
@@ -224,12 +246,45 @@ ALTER TABLE ONLY evaluation_terms ADD CONSTRAINT evaluation_terms_pkey PRIMARY K
 
 --
 
+CREATE TYPE job_run_status AS ENUM ('started', 'success', 'error');
+
+CREATE TABLE job_runs (
+    id integer NOT NULL,
+    job_key VARCHAR(80) NOT NULL,
+    status job_run_status NOT NULL,
+    term_id VARCHAR(4),
+    phase VARCHAR(80),
+    progress jsonb DEFAULT '[]'::jsonb NOT NULL,
+    error TEXT,
+    finished_at timestamp with time zone,
+    created_at timestamp with time zone DEFAULT now() NOT NULL,
+    updated_at timestamp with time zone DEFAULT now() NOT NULL
+);
+
+CREATE SEQUENCE job_runs_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+ALTER SEQUENCE job_runs_id_seq OWNED BY job_runs.id;
+ALTER TABLE ONLY job_runs ALTER COLUMN id SET DEFAULT nextval('job_runs_id_seq'::regclass);
+
+ALTER TABLE ONLY job_runs
+    ADD CONSTRAINT job_runs_pkey PRIMARY KEY (id);
+
+CREATE INDEX job_runs_job_key_created_at_idx ON job_runs USING btree (job_key, created_at);
+
+--
+
 CREATE TABLE json_cache (
     id integer NOT NULL,
     term_id VARCHAR(4) NOT NULL,
     department_id INTEGER NOT NULL,
     course_number VARCHAR(5),
     json jsonb,
+    payload BYTEA,
+    epoch BIGINT DEFAULT 0 NOT NULL,
     created_at timestamp with time zone NOT NULL,
     updated_at timestamp with time zone NOT NULL
 );
@@ -247,6 +302,38 @@ ALTER TABLE ONLY json_cache
     ADD CONSTRAINT json_cache_pkey PRIMARY KEY (id);
 
 CREATE UNIQUE INDEX json_cache_idx ON json_cache USING btree(term_id, department_id, course_number);
+CREATE UNIQUE INDEX json_cache_department_idx ON json_cache USING btree(term_id, department_id) WHERE course_number IS NULL;
+
+--
+
+CREATE SEQUENCE json_cache_epoch_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+CREATE TABLE json_cache_epochs (
+    term_id VARCHAR(4) NOT NULL,
+    scope VARCHAR(80) NOT NULL,
+    epoch BIGINT NOT NULL
+);
+
+ALTER TABLE ONLY json_cache_epochs
+    ADD CONSTRAINT json_cache_epochs_pkey PRIMARY KEY (term_id, scope);
+
+--
+
+CREATE TABLE json_cache_dependencies (
+    cache_id INTEGER NOT NULL,
+    kind VARCHAR(32) NOT NULL,
+    value VARCHAR(255) NOT NULL
+);
+
+ALTER TABLE ONLY json_cache_dependencies
+    ADD CONSTRAINT json_cache_dependencies_pkey PRIMARY KEY (kind, value, cache_id);
+
+CREATE INDEX json_cache_dependencies_cache_id_idx ON json_cache_dependencies USING btree(cache_id);
 
 --
 
@@ -393,6 +480,14 @@ ALTER TABLE ONLY evaluations
 ALTER TABLE ONLY evaluations
     ADD CONSTRAINT evaluations_evaluation_type_fkey FOREIGN KEY (evaluation_type_id) REFERENCES evaluation_types(id) ON DELETE CASCADE;
 
+ALTER TABLE ONLY department_sections
+    ADD CONSTRAINT department_sections_department_id_fkey FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE;
+ALTER TABLE ONLY department_section_refreshes
+    ADD CONSTRAINT department_section_refreshes_department_id_fkey FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE;
+
+ALTER TABLE ONLY json_cache_dependencies
+    ADD CONSTRAINT json_cache_dependencies_cache_id_fkey FOREIGN KEY (cache_id) REFERENCES json_cache(id) ON DELETE CASCADE;
+
 ALTER TABLE ONLY supplemental_sections
     ADD CONSTRAINT supplemental_sections_department_id_fkey FOREIGN KEY (department_id) REFERENCES departments(id) ON DELETE CASCADE;
 
@@ -59,7 +59,7 @@ CREATE TABLE unholy_loch.sis_sections (
     enrollment_count INTEGER,
     created_at TIMESTAMP WITH TIME ZONE NOT NULL,
     deleted_at TIMESTAMP WITH TIME ZONE
-);
+) PARTITION BY LIST (term_id);
 
 --
 
@@ -74,13 +74,15 @@ CREATE TABLE unholy_loch.sis_instructors (
     deleted_at TIMESTAMP WITH TIME ZONE
 );
 
+CREATE INDEX sis_instructors_ldap_uid_idx ON unholy_loch.sis_instructors USING btree (ldap_uid);
+
 -- SIS enrollment data is loaded by a simple wipe-and-refresh and doesn't require timestamp tracking.
 
 CREATE TABLE unholy_loch.sis_enrollments (
     term_id VARCHAR(4) NOT NULL,
     course_number VARCHAR(5) NOT NULL,
     ldap_uid VARCHAR(80) NOT NULL
-);
+) PARTITION BY LIST (term_id);
 
 CREATE TABLE unholy_loch.sis_terms
 (
@@ -96,10 +98,52 @@ CREATE TABLE unholy_loch.cross_listings (
     term_id VARCHAR(4) NOT NULL,
     course_number VARCHAR(5) NOT NULL,
     cross_listing_number VARCHAR(5) NOT NULL
-);
+) PARTITION BY LIST (term_id);
 
 CREATE TABLE unholy_loch.co_schedulings (
     term_id VARCHAR(4) NOT NULL,
     course_number VARCHAR(5) NOT NULL,
     room_share_number VARCHAR(5) NOT NULL
+) PARTITION BY LIST (term_id);
+
+-- Term-partitioned tables get a partition per term when the term is refreshed. Rows loaded for a term without its own
+-- partition go to the default partition until then.
+
+CREATE TABLE unholy_loch.sis_sections_default PARTITION OF unholy_loch.sis_sections DEFAULT;
+CREATE TABLE unholy_loch.sis_enrollments_default PARTITION OF unholy_loch.sis_enrollments DEFAULT;
+CREATE TABLE unholy_loch.cross_listings_default PARTITION OF unholy_loch.cross_listings DEFAULT;
+CREATE TABLE unholy_loch.co_schedulings_default PARTITION OF unholy_loch.co_schedulings DEFAULT;
+
+CREATE INDEX sis_sections_term_id_course_number_idx ON unholy_loch.sis_sections USING btree (term_id, course_number);
+CREATE INDEX sis_enrollments_term_id_course_number_ldap_uid_idx ON unholy_loch.sis_enrollments USING btree (term_id, course_number, ldap_uid);
+CREATE INDEX cross_listings_term_id_course_number_idx ON unholy_loch.cross_listings USING btree (term_id, course_number);
+CREATE INDEX cross_listings_term_id_cross_listing_number_idx ON unholy_loch.cross_listings USING btree (term_id, cross_listing_number);
+CREATE INDEX co_schedulings_term_id_course_number_idx ON unholy_loch.co_schedulings USING btree (term_id, course_number);
+CREATE INDEX co_schedulings_term_id_room_share_number_idx ON unholy_loch.co_schedulings USING btree (term_id, room_share_number);
+
+-- Changes found by refreshes of each term drive targeted invalidation of cached feeds. Changes are consumed once the
+-- invalidation they drive is committed.
+
+CREATE TABLE unholy_loch.sis_section_changes (
+    term_id VARCHAR(4) NOT NULL,
+    course_number VARCHAR(5),
+    instructor_uid VARCHAR(80),
+    change VARCHAR(20) NOT NULL,
+    consumed_at TIMESTAMP WITH TIME ZONE
 );
+
+CREATE INDEX sis_section_changes_term_id_idx ON unholy_loch.sis_section_changes USING btree (term_id);
+
+-- Basic attributes are loaded from the snapshot once per refresh when LOCH_SOURCE is 'snapshot', so that instructors
+-- added between refreshes can be looked up without reloading the snapshot.
+
+CREATE TABLE unholy_loch.basic_attributes (
+    ldap_uid VARCHAR(80),
+    sid VARCHAR(80),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    email_address VARCHAR(255),
+    affiliations TEXT
+);
+
+CREATE INDEX basic_attributes_ldap_uid_idx ON unholy_loch.basic_attributes USING btree (ldap_uid);
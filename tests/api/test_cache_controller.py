@@ -23,6 +23,12 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from types import SimpleNamespace
+from unittest import mock
+
+from damien import db
+from damien.lib import notifications
+
 
 non_admin_uid = '100'
 admin_uid = '200'
@@ -48,3 +54,46 @@ class TestJobClearCache:
     def test_authorized(self, client, fake_auth):
         fake_auth.login(admin_uid)
         _api_clear_cache(client)
+
+
+class TestCacheNotifications:
+
+    def test_receive(self):
+        """Counts notifications per topic and calls back subscribers to the topic name with its argument."""
+        received = []
+        with mock.patch.dict(notifications._counters, clear=True), mock.patch.dict(notifications._subscribers, clear=True):
+            notifications.subscribe('test_topic', received.append)
+            notifications._receive('test_topic:42')
+            notifications._receive('test_topic:42')
+            notifications._receive('test_topic')
+            notifications._receive('other_topic')
+            assert notifications._counters == {'test_topic:42': 2, 'test_topic': 1, 'other_topic': 1}
+        assert received == ['42', '42', None]
+
+    def test_generation(self):
+        """Gives listener connections and topic count while the listener is connected, and None otherwise."""
+        listener = SimpleNamespace(connections=2, listening=True)
+        with mock.patch.dict(notifications._counters, clear=True):
+            assert notifications.generation('json_cache') is None
+            with mock.patch.object(notifications, '_listener', listener):
+                assert notifications.generation('json_cache') == (2, 0)
+                notifications._receive('json_cache')
+                assert notifications.generation('json_cache') == (2, 1)
+                listener.connections = 3
+                assert notifications.generation('json_cache') == (3, 1)
+                listener.listening = False
+                assert notifications.generation('json_cache') is None
+
+    def test_publish(self):
+        """Applies a published notification to the publishing worker once its transaction commits."""
+        with mock.patch.dict(notifications._counters, clear=True):
+            notifications.publish('tool_setting', 'TEST_VERSION')
+            assert db.session().info['pending_notifications'] == {'tool_setting:TEST_VERSION'}
+            assert notifications._counters == {}
+            notifications._receive_pending_after_commit(db.session())
+            assert notifications._counters == {'tool_setting:TEST_VERSION': 1}
+            assert 'pending_notifications' not in db.session().info
+            notifications.publish('tool_setting', 'TEST_VERSION')
+            notifications._discard_pending_after_rollback(db.session())
+            assert 'pending_notifications' not in db.session().info
+            assert notifications._counters == {'tool_setting:TEST_VERSION': 1}
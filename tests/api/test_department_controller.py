@@ -23,11 +23,21 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import gzip
 import json
-
-from damien import std_commit
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from damien import db, std_commit
+from damien.lib import cache, notifications
+from damien.lib.cache import fetch_all_departments, fetch_department_cache, fetch_section_cache, flush_invalidations
+from damien.lib.queries import is_department_sections_refreshed, refresh_department_sections
 from damien.models.department import Department
+from damien.models.department_catalog_listing import DepartmentCatalogListing
 from damien.models.evaluation import Evaluation
+from damien.models.json_cache import JsonCache
 from tests.util import override_config
 
 
@@ -95,6 +105,79 @@ class TestEnrolledDepartments:
             assert 'totalSections' in d
             assert d['isEnrolled']
 
+    def test_local_cache(self, client, fake_auth, melc_id):
+        """Serves repeated reads from worker memory until a notification covers what they read."""
+        fake_auth.login(admin_uid)
+        _api_enrolled_departments(client, include_status=True)
+        flush_invalidations()
+        # Tests never commit, so clear the flag that keeps uncommitted cache changes out of worker memory.
+        db.session().info.pop('json_cache_changed', None)
+
+        listener = SimpleNamespace(connections=1, listening=True)
+        with mock.patch.object(notifications, '_listener', listener), \
+                mock.patch.dict(notifications._counters, clear=True), \
+                mock.patch.object(cache, '_local_cache', None), \
+                mock.patch.object(JsonCache, 'fetch_all_departments', wraps=JsonCache.fetch_all_departments) as fetch_departments, \
+                mock.patch.object(JsonCache, 'fetch_department', wraps=JsonCache.fetch_department) as fetch_department:
+            first = fetch_all_departments('2222')
+            department = fetch_department_cache(melc_id, '2222')
+            assert len(first) == 84
+            assert fetch_all_departments('2222') == first
+            assert fetch_department_cache(melc_id, '2222') == department
+            assert (fetch_departments.call_count, fetch_department.call_count) == (1, 1)
+
+            # Section feeds changing elsewhere in the term leave both cached.
+            notifications._receive(f'json_cache:2222:{melc_id + 1}')
+            notifications._receive('json_cache:2221:sections')
+            assert fetch_all_departments('2222') == first
+            assert fetch_department_cache(melc_id, '2222') == department
+            assert (fetch_departments.call_count, fetch_department.call_count) == (1, 1)
+
+            # A department summary changing elsewhere in the term reloads only the summaries.
+            notifications._receive('json_cache:2222:summaries')
+            fetch_all_departments('2222')
+            fetch_department_cache(melc_id, '2222')
+            assert (fetch_departments.call_count, fetch_department.call_count) == (2, 1)
+
+            # A change to the department, or to a course in every department, reloads the department.
+            notifications._receive(f'json_cache:2222:{melc_id}')
+            fetch_department_cache(melc_id, '2222')
+            notifications._receive('json_cache:2222:sections')
+            fetch_department_cache(melc_id, '2222')
+            assert fetch_department.call_count == 3
+
+            # While disconnected, reads bypass worker memory.
+            listener.listening = False
+            fetch_all_departments('2222')
+            fetch_all_departments('2222')
+            assert fetch_departments.call_count == 4
+
+    def test_publish_cache_scopes(self, melc_id):
+        """Publishes notifications naming the scope of cache writes and invalidations."""
+        with mock.patch.object(notifications, 'publish') as publish:
+            JsonCache.clear_department('2222', melc_id)
+            JsonCache.clear_department_section('2222', melc_id, '30659')
+            JsonCache.clear_section('2222', '30659')
+            JsonCache.clear_term('2222')
+        assert [c.args for c in publish.call_args_list] == [
+            ('json_cache', f'2222:{melc_id}'),
+            ('json_cache', '2222:summaries'),
+            ('json_cache', '2222:sections'),
+            ('json_cache', '2222'),
+        ]
+        assert db.session().info.pop('json_cache_changed') == {f'2222:{melc_id}', '2222:summaries', '2222:sections', '2222'}
+
+    def test_stale_summary_refreshing(self, client, fake_auth, melc_id):
+        """Serves a stale department summary flagged as refreshing, then the rebuilt summary."""
+        fake_auth.login(admin_uid)
+        _api_enrolled_departments(client, include_status=True)
+        JsonCache.clear_department('2222', melc_id)
+        stale = next(d for d in _api_enrolled_departments(client, include_status=True) if d['id'] == melc_id)
+        assert stale['refreshing'] is True
+        rebuilt = next(d for d in _api_enrolled_departments(client, include_status=True) if d['id'] == melc_id)
+        assert 'refreshing' not in rebuilt
+        assert rebuilt['totalEvaluations'] == stale['totalEvaluations']
+
 
 def _api_get_history(client, expected_status_code=200):
     dept = Department.find_by_name('History')
@@ -189,6 +272,79 @@ class TestGetDepartment:
         }
         assert elementary_sumerian['id'] == '_2222_30659_637739'
 
+    def test_streamed_evaluations(self, client, fake_auth, app):
+        """Streamed and unstreamed department feeds are identical."""
+        fake_auth.login(non_admin_uid)
+        streamed = _api_get_melc(client)
+        with override_config(app, 'STREAM_EVALUATION_FEEDS', False):
+            unstreamed = _api_get_melc(client)
+        assert streamed == unstreamed
+        assert len(streamed['evaluations']) == 44
+
+    def test_cached_evaluations(self, client, fake_auth, melc_id):
+        """Serves a department feed from section caches, without loch queries, matching the regenerated feed."""
+        fake_auth.login(non_admin_uid)
+        JsonCache.clear_term('2222')
+        regenerated = _api_get_melc(client)['evaluations']
+        with mock.patch('damien.models.department.get_loch_sections_by_department') as get_loch_sections:
+            cached = _api_get_melc(client)['evaluations']
+            assert not get_loch_sections.called
+        assert cached == regenerated
+        evaluation_ids = [regenerated[0]['id'], regenerated[-1]['id']]
+        filtered = Department.find_by_id(melc_id).evaluations_feed('2222', evaluation_ids=evaluation_ids)
+        assert filtered == [e for e in regenerated if e['id'] in evaluation_ids]
+
+    def test_feed_written_before_streaming(self, melc_id):
+        """Regenerated feeds are cached before any section is consumed, and sections invalidated mid-stream are regenerated."""
+        department = Department.find_by_id(melc_id)
+        JsonCache.clear_term('2222')
+        regenerated = department.evaluations_feed_by_section('2222')
+        assert fetch_department_cache(melc_id, '2222')['visibleCourseNumbers']
+        cached = department.evaluations_feed_by_section('2222')
+        JsonCache.clear_section('2222', '30666')
+        assert list(cached) == list(regenerated)
+        assert fetch_section_cache(melc_id, '2222', '30666') is None
+
+    def test_single_flight_regeneration(self, app, melc_id):
+        """Of two requests regenerating a feed at once, one regenerates while the other waits, despite intermediate commits."""
+        department = Department.find_by_id(melc_id)
+        cache_reads = []
+        regenerations = []
+
+        def _get_cached_feed(term_id, section_id, evaluation_ids):
+            cache_reads.append(term_id)
+            return [['regenerated']] if regenerations else None
+
+        def _regenerate_feed(term_id, section_id, evaluation_ids):
+            # Hold the lock until the other request has missed the cache, committing along the way as regeneration does.
+            for i in range(50):
+                if len(cache_reads) > 1:
+                    break
+                time.sleep(0.1)
+            std_commit(allow_test_environment=True)
+            time.sleep(0.5)
+            regenerations.append(term_id)
+            return [['regenerated']]
+
+        def _get_feed(results):
+            with app.app_context():
+                results.append(department.evaluations_feed_by_section('2222'))
+
+        results = []
+        checked_out = db.engine.pool.checkedout()
+        with mock.patch.object(Department, '_get_cached_feed', side_effect=_get_cached_feed), \
+                mock.patch.object(Department, '_regenerate_feed', side_effect=_regenerate_feed):
+            threads = [threading.Thread(target=_get_feed, args=(results,)) for i in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert len(regenerations) == 1
+        assert len(cache_reads) == 3
+        assert results == [[['regenerated']], [['regenerated']]]
+        # Lock connections are pooled, and returned once the lock is released.
+        assert db.engine.pool.checkedout() == checked_out
+
     def test_default_dates(self, client, fake_auth):
         fake_auth.login(non_admin_uid)
         department = _api_get_melc(client)
@@ -291,6 +447,21 @@ class TestGetDepartment:
         assert feed[4]['instructor']['lastName'] == 'Waterman'
         assert feed[4]['startDate'] == '2022-04-18'
 
+    def test_gzipped_section_feed(self, client, fake_auth, app, melc_id):
+        """Sends a compressed section cache as stored to clients accepting gzip."""
+        fake_auth.login(non_admin_uid)
+        with override_config(app, 'JSON_CACHE_FORMAT', 'gzip'):
+            JsonCache.clear_section('2222', '30666')
+            feed = client.get(f'/api/department/{melc_id}/section_evaluations/30666').json
+            response = client.get(f'/api/department/{melc_id}/section_evaluations/30666', headers={'Accept-Encoding': 'gzip'})
+            assert response.status_code == 200
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert json.loads(gzip.decompress(response.data)) == feed
+            assert len(feed) == 5
+            # Compressed section caches are decoded when assembling the department feed.
+            assert [e for e in _api_get_melc(client)['evaluations'] if e['courseNumber'] == '30666'] == feed
+        JsonCache.clear_section('2222', '30666')
+
     def test_nonstandard_default_dept_form(self, client, fake_auth):
         fake_auth.login(non_admin_uid)
         dept = Department.find_by_name('Real Estate Development and Design')
@@ -1097,6 +1268,40 @@ class TestAddSection:
         assert new_section['lastUpdated'] is not None
 
 
+class TestCatalogListingChange:
+
+    def test_add_listing(self, client, fake_auth, melc_id, form_melc_id):
+        """Sections under a new catalog listing are materialized in the same transaction, without matching on the loch."""
+        fake_auth.login(non_admin_uid)
+        assert is_department_sections_refreshed('2222', melc_id)
+        evaluations = _api_get_melc(client)['evaluations']
+        assert len(evaluations) == 44
+        assert not [e for e in evaluations if e['subjectArea'] == 'LGBT']
+
+        db.session.add(DepartmentCatalogListing(melc_id, 'LGBT', None, form_melc_id, False, None, None))
+        std_commit()
+        # Tests never commit, so flush pending cache invalidations as a commit would.
+        flush_invalidations()
+        assert is_department_sections_refreshed('2222', melc_id)
+        with mock.patch('damien.models.department.get_loch_sections') as get_loch_sections:
+            department = _api_get_melc(client)
+            assert not get_loch_sections.called
+        lgbt_evaluations = [e for e in department['evaluations'] if e['subjectArea'] == 'LGBT']
+        assert len(lgbt_evaluations)
+
+        Department.find_by_id(melc_id).refresh_sections('2222')
+        JsonCache.clear_department('2222', melc_id)
+        assert _api_get_melc(client)['evaluations'] == department['evaluations']
+
+    def test_refreshed_empty_department(self, history_id):
+        """Reading a department refreshed without sections neither refreshes nor writes."""
+        department = Department.find_by_id(history_id)
+        refresh_department_sections('2222', history_id, [])
+        with mock.patch('damien.models.department.refresh_department_sections') as refresh:
+            assert department.get_department_sections('2222') == []
+            assert not refresh.called
+
+
 def _api_update_department_note(client, dept=None, params={}, expected_status_code=200):
     if not dept:
         dept = Department.find_by_name('Philosophy')
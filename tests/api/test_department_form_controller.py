@@ -24,7 +24,11 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from damien import std_commit
+from damien.lib.berkeley import get_current_term_id
+from damien.lib.cache import flush_invalidations
+from damien.models.department import Department
 from damien.models.department_form import DepartmentForm
+from damien.models.json_cache import JsonCache
 
 non_admin_uid = '100'
 admin_uid = '200'
@@ -97,6 +101,22 @@ class TestDeleteDepartmentForm:
         deleted_type = DepartmentForm.query.filter_by(name='TEST').first()
         assert deleted_type.deleted_at is not None
 
+    def test_clears_dependent_evaluations(self, client, fake_auth):
+        """Clears cached evaluations using the deleted form."""
+        fake_auth.login(admin_uid)
+        department = Department.find_by_name('Middle Eastern Languages and Cultures')
+        evaluations = client.get(f'/api/department/{department.id}').json['evaluations']
+        assert next(e for e in evaluations if (e['departmentForm'] or {}).get('name') == 'CUNEIF')
+
+        _api_delete_department_form(client, name='CUNEIF')
+        # The department summary is kept, to be served stale while it is rebuilt.
+        flush_invalidations()
+        summary = JsonCache.fetch_department_summary(get_current_term_id(), department.id)
+        assert summary.json
+        assert summary.is_current is False
+        evaluations = client.get(f'/api/department/{department.id}').json['evaluations']
+        assert not next((e for e in evaluations if (e['departmentForm'] or {}).get('name') == 'CUNEIF'), None)
+
     def test_invalid_dept_id(self, client, fake_auth):
         """Fails silently when department form does not exist."""
         fake_auth.login(admin_uid)
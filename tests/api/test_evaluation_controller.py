@@ -24,9 +24,12 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 import re
+from unittest import mock
 
 from damien import std_commit
+from damien.models.evaluation import Evaluation, flush_validity_updates_on_teardown
 from damien.models.export import Export
+from flask import g
 from moto import mock_s3
 from tests.api.test_department_controller import \
     _api_get_evaluation, _api_update_evaluation, _api_update_history_evaluation, _api_update_melc_evaluation
@@ -170,6 +173,25 @@ def _api_get_confirmed(client, expected_status_code=200):
     return response.json
 
 
+class TestValidityWriteBack:
+
+    def test_flush_on_teardown(self, app):
+        """Writes validity changes left buffered when the app context ends."""
+        with mock.patch.object(Evaluation, 'flush_validity_updates') as flush_validity_updates:
+            with app.app_context():
+                g.evaluation_validity_updates = {1: {'valid': False, 'department_id': None, 'term_id': '2222', 'course_number': '30643'}}
+            assert flush_validity_updates.called
+
+    def test_discard_on_error(self, app):
+        """Drops buffered validity changes when the app context ends in error."""
+        with mock.patch.object(Evaluation, 'flush_validity_updates') as flush_validity_updates:
+            with app.app_context():
+                g.evaluation_validity_updates = {1: {'valid': False, 'department_id': None, 'term_id': '2222', 'course_number': '30643'}}
+                flush_validity_updates_on_teardown(RuntimeError())
+                assert 'evaluation_validity_updates' not in g
+            assert not flush_validity_updates.called
+
+
 class TestGetConfirmed:
 
     def test_anonymous(self, client):
@@ -127,3 +127,12 @@ class TestEvaluationTypes:
             assert e['updatedAt']
         assert next(e for e in eval_types if e['name'] == 'F')
         assert next(e for e in eval_types if e['name'] == '3A')
+
+    def test_reflects_changes(self, client, fake_auth):
+        """Lists evaluation types created or deleted since the previous request."""
+        fake_auth.login(admin_uid)
+        assert 'NEW' not in [e['name'] for e in _api_evaluation_types(client)]
+        _api_add_evaluation_type(client, name='NEW')
+        assert 'NEW' in [e['name'] for e in _api_evaluation_types(client)]
+        _api_delete_evaluation_type(client, name='NEW')
+        assert 'NEW' not in [e['name'] for e in _api_evaluation_types(client)]
@@ -23,6 +23,22 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+from damien import db
+from damien.jobs.refresh_unholy_loch import _invalidate_caches, _warm_up_cache, JOB_KEY
+from damien.lib.berkeley import get_meeting_dates
+from damien.lib.cache import fetch_department_cache
+from damien.lib.loch_source import load_basic_attributes_snapshot, load_loch_sources, SOURCE_TABLES
+from damien.lib.queries import consume_section_changes, get_section_changes, get_section_department_ids, refresh_additional_instructors
+from damien.models.department import Department
+from damien.models.job_run import JobRun
+from damien.models.tool_setting import ToolSetting
+from sqlalchemy import text
+from tests.util import override_config
+
 
 non_admin_uid = '100'
 admin_uid = '200'
@@ -71,3 +87,179 @@ class TestJobStatus:
         fake_auth.login(admin_uid)
         response = _api_job_status(client)
         assert response['status'] == 'done'
+
+
+def _api_job_history(client, limit=None, expected_status_code=200):
+    response = client.get('/api/job/history' + ('' if limit is None else f'?limit={limit}'))
+    assert response.status_code == expected_status_code
+    return response.json
+
+
+class TestJobHistory:
+
+    def test_anonymous(self, client):
+        """Denies anonymous user."""
+        _api_job_history(client, expected_status_code=401)
+
+    def test_unauthorized(self, client, fake_auth):
+        """Denies unauthorized user."""
+        fake_auth.login(non_admin_uid)
+        _api_job_history(client, expected_status_code=401)
+
+    def test_authorized(self, client, fake_auth):
+        run_id = JobRun.start(JOB_KEY)
+        JobRun.start_phase(run_id, 'sections', '2222')
+        JobRun.update_phase(run_id, rows=154, seconds=1.234)
+        JobRun.start_phase(run_id, 'warm-up', '2222')
+        JobRun.update_phase(run_id, rows=3)
+
+        fake_auth.login(admin_uid)
+        response = _api_job_status(client)
+        assert response['run']['id'] == run_id
+        assert response['run']['status'] == 'started'
+        assert response['run']['phase'] == 'warm-up'
+        assert response['run']['termId'] == '2222'
+
+        JobRun.finish(run_id, error='Refresh failed')
+        history = _api_job_history(client)
+        assert history[0]['id'] == run_id
+        assert history[0]['status'] == 'error'
+        assert history[0]['error'] == 'Refresh failed'
+        assert history[0]['finishedAt']
+        sections, warm_up = history[0]['progress']
+        assert sections['phase'] == 'sections'
+        assert sections['rows'] == 154
+        assert sections['seconds'] == 1.23
+        assert warm_up['phase'] == 'warm-up'
+        assert warm_up['rows'] == 3
+        assert 'seconds' not in warm_up
+
+    def test_limit(self, client, fake_auth):
+        """Clamps the requested number of runs to between 1 and 100."""
+        for i in range(2):
+            JobRun.finish(JobRun.start(JOB_KEY))
+        fake_auth.login(admin_uid)
+        assert len(_api_job_history(client, limit=1)) == 1
+        with mock.patch.object(JobRun, 'get_history', wraps=JobRun.get_history) as get_history:
+            assert len(_api_job_history(client, limit=-5)) == 1
+            assert len(_api_job_history(client, limit=1000)) >= 2
+            assert [c.kwargs['limit'] for c in get_history.call_args_list] == [1, 100]
+
+
+class TestCacheWarmUp:
+
+    def test_warm_up(self, app):
+        """Caches evaluation feeds for every enrolled department."""
+        progress = []
+        with override_config(app, 'LOCH_REFRESH_WARM_UP_WORKERS', 2):
+            timings = _warm_up_cache(app, '2222', on_progress=progress.append)
+        department_ids = [d.id for d in Department.all_enrolled()]
+        assert sorted(timings.keys()) == sorted(department_ids)
+        assert progress == list(range(1, len(department_ids) + 1))
+        for department_id in department_ids:
+            assert fetch_department_cache(department_id, '2222') is not None
+
+
+class TestSectionChanges:
+
+    def test_consume_changes(self):
+        """Returns changes until they are consumed."""
+        db.session().execute(
+            text("""INSERT INTO unholy_loch.sis_section_changes (term_id, course_number, instructor_uid, change, consumed_at) VALUES
+                ('2222', '30658', NULL, 'deleted', now()),
+                ('2222', '30659', NULL, 'updated', NULL),
+                ('2222', NULL, '606481', 'instructor', NULL)"""),
+        )
+        try:
+            changes = get_section_changes('2222')
+            assert sorted((c.change, c.course_number, c.instructor_uid) for c in changes) == [
+                ('instructor', None, '606481'),
+                ('updated', '30659', None),
+            ]
+            assert consume_section_changes('2222') == 2
+            assert get_section_changes('2222') == []
+        finally:
+            db.session().execute(text("DELETE FROM unholy_loch.sis_section_changes WHERE term_id = '2222'"))
+
+    def test_section_department_ids(self, history_id, melc_id):
+        """Finds departments by department sections, supplemental sections and evaluations."""
+        assert get_section_department_ids('2222', []) == []
+        assert get_section_department_ids('2222', ['99999']) == []
+        assert get_section_department_ids('2222', ['30659']) == [melc_id]
+        db.session().execute(
+            text("INSERT INTO supplemental_sections (term_id, course_number, department_id) VALUES ('2222', '30659', :department_id)"),
+            {'department_id': history_id},
+        )
+        try:
+            assert sorted(get_section_department_ids('2222', ['30659'])) == sorted([history_id, melc_id])
+        finally:
+            db.session().execute(
+                text("DELETE FROM supplemental_sections WHERE term_id = '2222' AND course_number = '30659' AND department_id = :department_id"),
+                {'department_id': history_id},
+            )
+
+    @mock.patch('damien.jobs.refresh_unholy_loch.clear_dependent_caches')
+    @mock.patch('damien.jobs.refresh_unholy_loch.clear_department_cache')
+    @mock.patch('damien.jobs.refresh_unholy_loch.clear_section_cache')
+    @mock.patch('damien.jobs.refresh_unholy_loch.clear_term_cache')
+    def test_invalidate_caches(self, clear_term_cache, clear_section_cache, clear_department_cache, clear_dependent_caches, app):
+        """Clears caches of changed sections, departments and instructors, or the whole term if meeting dates changed."""
+        changes = [
+            SimpleNamespace(course_number='30659', instructor_uid=None, change='updated'),
+            SimpleNamespace(course_number=None, instructor_uid='606481', change='instructor'),
+        ]
+        meeting_dates = get_meeting_dates(['2222'])['2222']
+        _invalidate_caches(app, '2222', changes, {'30659'}, {66, 67}, meeting_dates)
+        assert not clear_term_cache.called
+        clear_section_cache.assert_called_once_with('2222', '30659')
+        assert sorted(c.args for c in clear_department_cache.call_args_list) == [(66, '2222'), (67, '2222')]
+        clear_dependent_caches.assert_called_once_with('instructor', '606481')
+
+        for m in [clear_section_cache, clear_department_cache, clear_dependent_caches]:
+            m.reset_mock()
+        _invalidate_caches(app, '2222', changes, {'30659'}, {66, 67}, {'default': None, 'valid': None})
+        clear_term_cache.assert_called_once_with('2222')
+        assert not clear_section_cache.called
+        assert not clear_department_cache.called
+        assert not clear_dependent_caches.called
+
+
+class TestLochSnapshot:
+
+    def test_load_loch_sources(self, app):
+        """Loads upstream SIS rows for the term from snapshot files."""
+        with override_config(app, 'LOCH_SOURCE', 'snapshot'), \
+                override_config(app, 'LOCH_SNAPSHOT_PATH', f"{app.config['FIXTURES_PATH']}/loch_snapshot"):
+            try:
+                counts = load_loch_sources('2222')
+                assert counts == {'sis_terms': 1, 'sis_sections': 2, 'sis_instructors': 1, 'sis_enrollments': 3, 'course_listings': 2}
+                sections = db.session().execute(
+                    text('SELECT course_number, is_primary, instructor_uid, meeting_start_date FROM loch_source_sis_sections ORDER BY course_number'),
+                ).all()
+                assert [(s.course_number, s.is_primary, s.instructor_uid, str(s.meeting_start_date)) for s in sections] == [
+                    ('30658', True, '9999901', '2022-01-18'),
+                    ('30659', True, None, '2022-01-18'),
+                ]
+            finally:
+                for table in SOURCE_TABLES:
+                    db.session().execute(text(f'DROP TABLE IF EXISTS loch_source_{table}'))
+
+    def test_refresh_additional_instructors(self, app):
+        """Looks up instructors added between refreshes in basic attributes loaded once from the snapshot."""
+        with override_config(app, 'LOCH_SOURCE', 'snapshot'), \
+                override_config(app, 'LOCH_SNAPSHOT_PATH', f"{app.config['FIXTURES_PATH']}/loch_snapshot"), \
+                mock.patch.dict(os.environ, {'DAMIEN_ENV': 'testext'}), \
+                mock.patch.object(ToolSetting, 'bump_version') as bump_version:
+            try:
+                assert load_basic_attributes_snapshot() == 2
+                with mock.patch('damien.lib.loch_source._copy_snapshot') as copy_snapshot:
+                    assert refresh_additional_instructors(['9999902']) is True
+                    assert not copy_snapshot.called
+                bump_version.assert_called_once_with('INSTRUCTOR_DIRECTORY_VERSION')
+                instructor = db.session().execute(
+                    text("SELECT sis_id, first_name, last_name, email_address FROM unholy_loch.sis_instructors WHERE ldap_uid = '9999902'"),
+                ).one()
+                assert tuple(instructor) == ('3039999902', 'Gudea', 'Lagash', None)
+            finally:
+                db.session().execute(text("DELETE FROM unholy_loch.sis_instructors WHERE ldap_uid = '9999902'"))
+                db.session().execute(text('TRUNCATE TABLE unholy_loch.basic_attributes'))
@@ -23,6 +23,13 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+import re
+
+from damien import db
+from damien.models.department_catalog_listing import CatalogListingMatcher, DepartmentCatalogListing
+from sqlalchemy import text
+
+
 non_admin_uid = '100'
 
 
@@ -58,3 +65,23 @@ class TestGetSection:
             'sectionNumber': '003',
             'courseTitle': 'Special Studies: Cuneiform',
         }
+
+
+def _naive_find_catalog_listing(catalog_listings, subject_area, catalog_id):
+    candidates = [
+        c for c in catalog_listings
+        if c.subject_area in (subject_area, '') and (c.catalog_id is None or re.match(f'^{c.catalog_id}$', catalog_id))
+    ]
+    return next((c for c in candidates if c.catalog_id), None) or next(iter(candidates), None)
+
+
+class TestCatalogListingMatcher:
+
+    def test_matches_naive_scan(self):
+        """Finds the same catalog listing as a scan of every listing, for every section in the loch."""
+        catalog_listings = DepartmentCatalogListing.query.order_by(DepartmentCatalogListing.id).all()
+        matcher = CatalogListingMatcher(catalog_listings)
+        rows = db.session.execute(text('SELECT DISTINCT subject_area, catalog_id FROM unholy_loch.sis_sections')).all()
+        rows += [('EDUC', '131AC'), ('HISTORY', '182AT'), ('HISTORY', '182A'), ('NOSUCH', '1')]
+        for subject_area, catalog_id in rows:
+            assert matcher.find(subject_area, catalog_id) is _naive_find_catalog_listing(catalog_listings, subject_area, catalog_id)